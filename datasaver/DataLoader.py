@@ -0,0 +1,132 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from datasaver.DataSaver import DataSaver
+
+
+class DataLoader:
+    """
+    Reads data saved in chunks by `DataSaver`.
+
+    The manifest and the shared index file are read when the loader is created. `load` returns any range of columns
+    (time points) and any selection of rows, opening only the chunks that overlap the requested columns. Binary
+    chunks are memory-mapped, so only the selected rows and columns are read from disk.
+
+    Args:
+        directory (str): The directory the data was saved to.
+        mmap_mode (str): Memory-map mode of the binary chunks (None reads whole chunks into memory).
+    """
+    def __init__(self, directory: str, mmap_mode: str = 'r') -> None:
+        self.directory = os.path.normpath(directory)
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(self.directory, DataSaver.manifest_name)) as file:
+            self.manifest = json.load(file)
+        if self.manifest['format'] != DataSaver.format_version:
+            raise ValueError(f"Unsupported data format: {self.manifest['format']}")
+
+        # labels are read as strings as they are ('None', the parent of the root, must not become NaN)
+        index_frame = pd.read_csv(os.path.join(self.directory, self.manifest['index_file']), dtype=str,
+                                  keep_default_na=False)
+        index_frame.columns = self.manifest['index_names']
+        self.index = pd.MultiIndex.from_frame(index_frame)
+        self.dtype = np.dtype(self.manifest['dtype'])
+
+    @property
+    def shape(self) -> tuple:
+        """(number of rows, number of columns) of the whole dataset."""
+        return self.manifest['n_rows'], self.manifest['n_columns']
+
+    def chunk_files(self, start_idx: int = 0, end_idx: int = None) -> list:
+        """
+        Returns the paths of the chunk files overlapping a range of columns, ordered by their first column.
+        """
+        end_idx = self.shape[1] if end_idx is None else end_idx
+        return [os.path.join(self.directory, chunk['file']) for chunk in self.manifest['chunks']
+                if chunk['end'] > start_idx and chunk['start'] < end_idx]
+
+    def select_rows(self, rows=None, **level_values) -> np.ndarray:
+        """
+        Returns the positions of the selected rows.
+
+        Parameters:
+            rows (array-like): Optional row positions or a boolean mask.
+            **level_values: Values to select per index level, e.g. `segment=['soma', 'dend1']`, `itype=['ina']` or
+                            `ref=['dend2']`.
+
+        Returns:
+            np.ndarray: The sorted row positions.
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if rows is not None:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                mask &= rows
+            else:
+                selected = np.zeros(len(self.index), dtype=bool)
+                selected[rows] = True
+                mask &= selected
+        for level, values in level_values.items():
+            if level not in self.index.names:
+                raise ValueError(f"Invalid index level: {level} (levels: {list(self.index.names)})")
+            values = [values] if isinstance(values, str) else values
+            mask &= self.index.get_level_values(level).isin(values)
+        return np.flatnonzero(mask)
+
+    def load(self, start_idx: int = 0, end_idx: int = None, rows=None, **level_values) -> pd.DataFrame:
+        """
+        Loads a range of columns for a selection of rows.
+
+        Parameters:
+            start_idx (int): First column (time point) to load.
+            end_idx (int): Column after the last one to load (default: the end of the data).
+            rows (array-like): Optional row positions or a boolean mask.
+            **level_values: Values to select per index level (see `select_rows`).
+
+        Returns:
+            pd.DataFrame: The selected data, indexed like the saved data; columns are the time point indices.
+        """
+        n_rows, n_columns = self.shape
+        end_idx = n_columns if end_idx is None else min(end_idx, n_columns)
+        if start_idx < 0 or start_idx > end_idx:
+            raise ValueError(f"Invalid column range: {start_idx}:{end_idx}")
+        row_positions = self.select_rows(rows, **level_values)
+        all_rows = len(row_positions) == n_rows
+
+        values = np.empty((len(row_positions), end_idx - start_idx), dtype=self.dtype)
+        filled = start_idx
+        for chunk in self.manifest['chunks']:
+            if chunk['end'] <= start_idx or chunk['start'] >= end_idx:
+                continue
+            if chunk['start'] > filled:
+                break
+            chunk_start = max(start_idx, chunk['start']) - chunk['start']
+            chunk_end = min(end_idx, chunk['end']) - chunk['start']
+            chunk_values = self._read_chunk(chunk, chunk_start, chunk_end)
+            offset = chunk['start'] + chunk_start - start_idx
+            values[:, offset:offset + chunk_end - chunk_start] = (
+                chunk_values if all_rows else chunk_values[row_positions])
+            filled = chunk['start'] + chunk_end
+        if filled < end_idx:
+            raise ValueError(f"Columns {filled}:{end_idx} are missing in '{self.directory}'")
+
+        return pd.DataFrame(data=values, index=self.index[row_positions], columns=pd.RangeIndex(start_idx, end_idx),
+                            copy=False)
+
+    def to_csv(self, path: str, start_idx: int = 0, end_idx: int = None, rows=None, **level_values) -> None:
+        """
+        Exports a range of columns for a selection of rows to a single CSV file (see `load`).
+        """
+        df = self.load(start_idx, end_idx, rows, **level_values)
+        df.columns = list(range(df.shape[1]))
+        df.to_csv(path)
+
+    def _read_chunk(self, chunk: dict, chunk_start: int, chunk_end: int):
+        path = os.path.join(self.directory, chunk['file'])
+        if self.manifest['file_format'] == 'npy':
+            return np.load(path, mmap_mode=self.mmap_mode)[:, chunk_start:chunk_end]
+        # CSV chunks: parse only the requested columns (the index is taken from the shared index file)
+        n_levels = len(self.manifest['index_names'])
+        use_columns = list(range(n_levels + chunk_start, n_levels + chunk_end))
+        return pd.read_csv(path, usecols=use_columns).to_numpy(dtype=self.dtype)
@@ -1,4 +1,5 @@
 import os
+import json
 import pandas as pd
 import numpy as np
 
@@ -6,49 +7,110 @@ class DataSaver:
     """
     A class for saving large DataFrames in chunks to manage memory usage efficiently.
 
+    Data is saved as raw binary .npy chunks (one file per range of columns) together with one shared index file and
+    a manifest ('manifest.json') describing the chunks, so the data can be read back chunk by chunk. CSV chunks,
+    each including the index, can still be written with `file_format='csv'`.
+
     Args:
         columns_in_chunk (int): Number of columns per chunk when saving data.
+        dtype (np.dtype): The dtype of the saved values. Data that already has this dtype is saved without a copy.
+        file_format (str): 'npy' (default) for binary chunks or 'csv' for CSV chunks.
     """
-    def __init__(self, columns_in_chunk: int) -> None:
+    manifest_name = 'manifest.json'
+    format_version = 1
+
+    def __init__(self, columns_in_chunk: int, dtype=np.float32, file_format: str = 'npy') -> None:
+        if file_format not in ('npy', 'csv'):
+            raise ValueError(f"Invalid file format: {file_format}")
         self.columns_in_chunk = columns_in_chunk
+        self.dtype = np.dtype(dtype)
+        self.file_format = file_format
 
-    def save_in_chunks(self, data: pd.DataFrame, output: str, data_name: str = 'data') -> None:
+    def save_in_chunks(self, data: pd.DataFrame, output: str, data_name: str = 'data', column_offset: int = 0) -> None:
         """
         Saves the data in chunks as .npy files along with a CSV file for the MultiIndex.
 
         The method splits the DataFrame into smaller chunks by columns and saves each chunk as
-        a .npy file in the specified output directory. It also saves the DataFrame's MultiIndex
-        to a uniquely named CSV file to ensure data consistency during loading.
+        a .npy file ('current_values_{start}_{end}.npy') in the specified output directory. The DataFrame's
+        MultiIndex is saved once to '{data_name}_index.csv', and the manifest lists the chunks with their column
+        ranges. With `file_format='csv'`, every chunk is written as a CSV file including the index instead.
+
+        Data that is saved window by window (e.g. the chunks yielded by `Preprocessor.iter_time_windows`) is
+        collected in one dataset: calls with `column_offset > 0` append their chunks to the existing manifest, while
+        `column_offset=0` starts a new dataset.
 
         Args:
             data (pd.DataFrame): The DataFrame containing data to be saved. Must have a MultiIndex.
             output (str): The directory where the chunks and index file will be saved.
             data_name (str): The name of the data variable to use in the index filename.
+            column_offset (int): Index of the first column in the whole recording (e.g. the start of a time window
+                                 yielded by `Preprocessor.iter_time_windows`), used in the chunk filenames.
         """
         output = os.path.normpath(output)
         print(f"Saving {data_name} into '{output}'...")
         if not os.path.exists(output):
             os.makedirs(output)
 
-        values = data.values.astype(np.float32)
+        values = data.to_numpy(dtype=self.dtype, copy=False)
+        manifest = self._start_manifest(data, output, data_name, column_offset)
 
         # If no chunk_size is provided, save the whole array in one file
-        if self.columns_in_chunk is None:
-            self.columns_in_chunk = values.shape[1]
+        columns_in_chunk = values.shape[1] if self.columns_in_chunk is None else self.columns_in_chunk
+        columns_in_chunk = max(columns_in_chunk, 1)
 
-        num_chunks = values.shape[1] // self.columns_in_chunk + (1 if values.shape[1] % self.columns_in_chunk != 0 else 0)
+        num_chunks = values.shape[1] // columns_in_chunk + (1 if values.shape[1] % columns_in_chunk != 0 else 0)
 
         for i in range(num_chunks):
-            start_idx = i * self.columns_in_chunk
-            end_idx = min((i + 1) * self.columns_in_chunk, values.shape[1])
+            start_idx = i * columns_in_chunk
+            end_idx = min((i + 1) * columns_in_chunk, values.shape[1])
 
             chunk_values = values[:, start_idx:end_idx]
 
-            chunk_file = os.path.join(output, f'current_values_{start_idx}_{end_idx}.csv')
-            df = pd.DataFrame(data=chunk_values, index=data.index)
-            df.columns = list(df.columns)
-            df.to_csv(chunk_file)
+            chunk_name = f'current_values_{column_offset + start_idx}_{column_offset + end_idx}.{self.file_format}'
+            if self.file_format == 'npy':
+                np.save(os.path.join(output, chunk_name), chunk_values)
+            else:
+                df = pd.DataFrame(data=chunk_values, index=data.index)
+                df.columns = list(df.columns)
+                df.to_csv(os.path.join(output, chunk_name))
+            manifest['chunks'].append({'file': chunk_name, 'start': column_offset + start_idx,
+                                       'end': column_offset + end_idx})
+
+        manifest['chunks'].sort(key=lambda chunk: chunk['start'])
+        manifest['n_columns'] = max((chunk['end'] for chunk in manifest['chunks']), default=0)
+        self._write_manifest(manifest, output)
+
+    def _start_manifest(self, data: pd.DataFrame, output: str, data_name: str, column_offset: int) -> dict:
+        manifest_file = os.path.join(output, self.manifest_name)
+        if column_offset > 0 and os.path.exists(manifest_file):
+            with open(manifest_file) as file:
+                manifest = json.load(file)
+            if manifest['n_rows'] != len(data.index) or manifest['file_format'] != self.file_format:
+                raise ValueError(f"Data does not match the dataset in '{output}'")
+            # replace chunks that are written again
+            manifest['chunks'] = [chunk for chunk in manifest['chunks']
+                                  if chunk['end'] <= column_offset or chunk['start'] >= column_offset + data.shape[1]]
+            return manifest
+
+        index_file = f'{data_name}_index.csv'
+        index_frame = data.index.to_frame(index=False)
+        index_frame.to_csv(os.path.join(output, index_file), index=False)
+        return {'format': self.format_version,
+                'data_name': data_name,
+                'file_format': self.file_format,
+                'dtype': self.dtype.str,
+                'index_file': index_file,
+                'index_names': [str(name) for name in index_frame.columns],
+                'n_rows': len(data.index),
+                'n_columns': 0,
+                'chunks': []}
 
+    def _write_manifest(self, manifest: dict, output: str) -> None:
+        # write to a temporary file first, so that readers never see a partial manifest
+        tmp_file = os.path.join(output, f'{self.manifest_name}.{os.getpid()}.tmp')
+        with open(tmp_file, 'w') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(tmp_file, os.path.join(output, self.manifest_name))
 
     def save_time_axis(self, output:str, time_axis: np.ndarray) -> None:
         np.save(output, time_axis)
@@ -0,0 +1,168 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+
+class SimulationStore:
+    """
+    Persistent store of raw simulation data as .npy files with a small JSON manifest.
+
+    `SimulationStore.save` writes the time axis, membrane potentials, intrinsic and synaptic currents (with their
+    segment ids) and the connection, area and segment tables of a simulation to a directory. Opening the directory
+    gives an object that can be used in place of the simulation data (e.g. by `Preprocessor`): arrays are opened with
+    `np.load(mmap_mode='r')`, so only the parts that are used are read from disk, and NEURON is not needed. Simulation
+    and preprocessing can thereby run as separate jobs.
+
+    Args:
+        directory (str): Directory of the store.
+        mmap_mode (str): Memory-map mode of the arrays (None loads them into memory).
+    """
+    manifest_name = 'manifest.json'
+    format_version = 1
+
+    _keys = ('membrane_potential_data', 'intrinsic_data', 'synaptic_data', 'taxis', 'connections', 'areas',
+             'segment_table')
+
+    def __init__(self, directory: str, mmap_mode: str = 'r') -> None:
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(directory, self.manifest_name)) as file:
+            self.manifest = json.load(file)
+        if self.manifest['format'] != self.format_version:
+            raise ValueError(f"Unsupported simulation store format: {self.manifest['format']}")
+        self._cache = {}
+
+    @classmethod
+    def save(cls, simulation_data, directory: str) -> 'SimulationStore':
+        """
+        Writes simulation data to a directory and opens it as a store.
+
+        Parameters:
+            simulation_data (dict): The simulation data (e.g. a SimulationResult).
+            directory (str): The directory of the store (created if needed).
+
+        Returns:
+            SimulationStore: The store.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        def save_array(name, array):
+            array = np.asarray(array)
+            if array.dtype == object:
+                array = array.astype(str)  # names are stored as fixed-width strings (no pickling)
+            np.save(os.path.join(directory, f'{name}.npy'), array, allow_pickle=False)
+            return f'{name}.npy'
+
+        def save_block(prefix, segments, values):
+            return {current: {'segments': save_array(f'{prefix}_{current}_segments', np.asarray(segments[current])),
+                              'values': save_array(f'{prefix}_{current}', values[current])}
+                    for current in segments}
+
+        def save_frame(name, df):
+            return {'index': save_array(f'{name}_index', df.index),
+                    'index_name': df.index.name,
+                    'columns': {column: save_array(f'{name}_{column}', df[column]) for column in df.columns}}
+
+        segments, membrane_potential = simulation_data['membrane_potential_data']
+        manifest = {
+            'format': cls.format_version,
+            'taxis': save_array('taxis', simulation_data['taxis']),
+            'membrane_potential': {'segments': save_array('membrane_potential_segments', np.asarray(segments)),
+                                   'values': save_array('membrane_potential', membrane_potential)},
+            'intrinsic': save_block('intrinsic', *simulation_data['intrinsic_data']),
+            'synaptic': save_block('synaptic', *simulation_data['synaptic_data']),
+            'connections': save_frame('connections', simulation_data['connections']),
+            'areas': save_frame('areas', simulation_data['areas']),
+        }
+        segment_table = simulation_data['segment_table'] if 'segment_table' in simulation_data else None
+        if segment_table is not None:
+            manifest['segment_table'] = save_frame('segment_table', segment_table)
+
+        # write the manifest last, so that an incomplete store cannot be opened
+        tmp_manifest = os.path.join(directory, f'{cls.manifest_name}.{os.getpid()}.tmp')
+        with open(tmp_manifest, 'w') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(tmp_manifest, os.path.join(directory, cls.manifest_name))
+        return cls(directory)
+
+    @property
+    def taxis(self) -> np.ndarray:
+        return self._get('taxis')
+
+    @property
+    def membrane_potential_data(self) -> list:
+        return self._get('membrane_potential_data')
+
+    @property
+    def intrinsic_data(self) -> list:
+        return self._get('intrinsic_data')
+
+    @property
+    def synaptic_data(self) -> list:
+        return self._get('synaptic_data')
+
+    @property
+    def connections(self) -> pd.DataFrame:
+        return self._get('connections')
+
+    @property
+    def areas(self) -> pd.DataFrame:
+        return self._get('areas')
+
+    @property
+    def segment_table(self):
+        return self._get('segment_table')
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.taxis)
+
+    def keys(self) -> tuple:
+        return self._keys
+
+    def __getitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def _get(self, key: str):
+        if key not in self._cache:
+            manifest = self.manifest
+            if key == 'taxis':
+                value = self._load(manifest['taxis'])
+            elif key == 'membrane_potential_data':
+                value = [self._load(manifest['membrane_potential']['segments'], mmap_mode=None),
+                         self._load(manifest['membrane_potential']['values'])]
+            elif key in ('intrinsic_data', 'synaptic_data'):
+                block = manifest[key.split('_')[0]]
+                value = [{current: self._load(files['segments'], mmap_mode=None) for current, files in block.items()},
+                         {current: self._load(files['values']) for current, files in block.items()}]
+            elif key == 'segment_table' and key not in manifest:
+                value = None
+            else:
+                value = self._load_frame(manifest[key])
+            self._cache[key] = value
+        return self._cache[key]
+
+    def _load(self, name: str, mmap_mode: str = 'default') -> np.ndarray:
+        mmap_mode = self.mmap_mode if mmap_mode == 'default' else mmap_mode
+        path = os.path.join(self.directory, name)
+        try:
+            return np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        except ValueError:
+            # empty arrays cannot be memory-mapped
+            return np.load(path, allow_pickle=False)
+
+    def _load_frame(self, entry: dict) -> pd.DataFrame:
+        # tables are small, so they are read into memory
+        def load_column(name):
+            values = self._load(name, mmap_mode=None)
+            return values.astype(object) if values.dtype.kind == 'U' else values
+
+        index = pd.Index(load_column(entry['index']), name=entry['index_name'])
+        columns = {column: load_column(name) for column, name in entry['columns'].items()}
+        return pd.DataFrame(columns, index=index)
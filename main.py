@@ -6,6 +6,7 @@ from model_simulation.SimpleModel import SimpleModel
 from model_simulation.simulation import run_simulation, add_single_synapse
 from preprocessor.Preprocessor import Preprocessor
 from datasaver.DataSaver import DataSaver
+from datasaver.DataLoader import DataLoader
 from currentscape_calculator.CurrentscapeCalculator import CurrentscapeCalculator
 
 target = 'soma'
@@ -27,7 +28,8 @@ iax = preprocessor.preprocess_axial_currents()
 # save results
 preprocessed_im_directory = 'preprocessed/im'
 preprocessed_iax_directory = 'preprocessed/iax'
-preprocessed_datasaver = DataSaver(columns_in_chunk=None)
+# the currentscape calculator reads one CSV file per current, so the currents are saved as a single CSV chunk
+preprocessed_datasaver = DataSaver(columns_in_chunk=None, file_format='csv')
 preprocessed_datasaver.save_in_chunks(im, os.path.join(output_directory, preprocessed_im_directory), 'im')
 preprocessed_datasaver.save_in_chunks(iax, os.path.join(output_directory, preprocessed_iax_directory), 'iax')
 preprocessed_datasaver.save_time_axis(output_directory + '/taxis', simulation_data['taxis'])
@@ -36,8 +38,8 @@ preprocessed_datasaver.save_time_axis(output_directory + '/taxis', simulation_da
 regions_list_directory = 'currentscape_calculator/regions'
 currentscape_calculator = CurrentscapeCalculator(target, partitioning_strategy, regions_list_directory)
 input_directory = os.path.join(output_directory, 'preprocessed')
-iax_file = os.path.join(input_directory, 'iax', 'current_values_0_328.csv')
-im_file = os.path.join(input_directory, 'im', 'current_values_0_328.csv')
+iax_file, = DataLoader(os.path.join(input_directory, 'iax')).chunk_files()
+im_file, = DataLoader(os.path.join(input_directory, 'im')).chunk_files()
 
 im_part_pos, im_part_neg = currentscape_calculator.calculate_currentscape(iax_file, im_file, timepoints=None)
 
@@ -0,0 +1,224 @@
+import numpy as np
+from neuron import h
+
+from model_simulation.SimpleModel import SimpleModel
+
+# Section name prefixes by SWC structure type (all other types are treated as dendrites)
+swc_section_names = {2: 'axon', 3: 'dend', 4: 'apic'}
+
+
+def lambda_f(sec, frequency=100):
+    """
+    Computes the AC length constant of a section at the given frequency (in um), taking 3D diameters into account.
+
+    Parameters:
+        sec (h.Section): The section.
+        frequency (float): The frequency (Hz).
+
+    Returns:
+        float: The length constant (um).
+    """
+    if sec.n3d() < 2:
+        return 1e5 * np.sqrt(sec.diam / (4 * np.pi * frequency * sec.Ra * sec.cm))
+    x1, d1 = sec.arc3d(0), sec.diam3d(0)
+    lam = 0
+    for i in range(1, sec.n3d()):
+        x2, d2 = sec.arc3d(i), sec.diam3d(i)
+        lam += (x2 - x1) / np.sqrt(d1 + d2)
+        x1, d1 = x2, d2
+    lam *= np.sqrt(2) * 1e-5 * np.sqrt(4 * np.pi * frequency * sec.Ra * sec.cm)
+    return sec.L / lam
+
+
+def d_lambda_nseg(sec, d_lambda=0.1, frequency=100):
+    """
+    Returns the (odd) number of segments given by the d_lambda rule.
+
+    Parameters:
+        sec (h.Section): The section.
+        d_lambda (float): Maximum segment length as a fraction of the length constant.
+        frequency (float): The frequency (Hz) the length constant is computed at.
+
+    Returns:
+        int: The number of segments.
+    """
+    return int((sec.L / (d_lambda * lambda_f(sec, frequency)) + 0.9) / 2) * 2 + 1
+
+
+def read_swc(swc_file):
+    """
+    Reads an SWC morphology file.
+
+    Parameters:
+        swc_file (str): Path to the SWC file.
+
+    Returns:
+        dict: Keys are point ids, values are (type, x, y, z, radius, parent id) tuples.
+    """
+    rows = np.loadtxt(swc_file, comments='#', ndmin=2)
+    return {int(row[0]): (int(row[1]), row[2], row[3], row[4], row[5], int(row[6])) for row in rows}
+
+
+class MorphologyModel(SimpleModel):
+    """
+    Base class for models with an arbitrary number of dendritic sections and d_lambda discretization.
+
+    Subclasses implement `topology`, which must create `self.soma` and the list `self.dendrites`. Every section is
+    also accessible as an attribute named after the section (e.g. `model.dend12`), so the model can be used with
+    `run_simulation` and `add_single_synapse` like SimpleModel. The biophysics of SimpleModel (`props`) are applied
+    to all sections, and `nseg` is then set with the d_lambda rule.
+
+    Args:
+        d_lambda (float): Maximum segment length as a fraction of the length constant at `frequency`.
+        frequency (float): The frequency (Hz) used by the d_lambda rule.
+    """
+    def __init__(self, d_lambda=0.1, frequency=100):
+        self.d_lambda = d_lambda
+        self.frequency = frequency
+        super().__init__()
+        self.discretize()
+
+    def add_section(self, name):
+        sec = h.Section(name=name)
+        setattr(self, name, sec)
+        return sec
+
+    def discretize(self):
+        for sec in [self.soma] + self.dendrites:
+            sec.nseg = d_lambda_nseg(sec, self.d_lambda, self.frequency)
+
+
+class SwcModel(MorphologyModel):
+    """
+    Loads a morphology from an SWC file.
+
+    The soma points form a single section named 'soma' (a one-point soma becomes a cylinder with the area of the
+    sphere). Every unbranched stretch of neurite becomes one section named by its SWC type and a running counter
+    ('dend1', 'apic3', 'axon1', ...). Neurites starting at the soma (or without a parent) are attached to soma(0.5),
+    all other sections to the 1 end of their parent section.
+
+    Args:
+        swc_file (str): Path to the SWC file.
+        d_lambda (float): Maximum segment length as a fraction of the length constant at `frequency`.
+        frequency (float): The frequency (Hz) used by the d_lambda rule.
+    """
+    def __init__(self, swc_file, d_lambda=0.1, frequency=100):
+        self.swc_file = swc_file
+        super().__init__(d_lambda, frequency)
+
+    def topology(self):
+        points = read_swc(self.swc_file)
+        children = {point_id: [] for point_id in points}
+        for point_id, (_, _, _, _, _, parent_id) in points.items():
+            if parent_id in children:
+                children[parent_id].append(point_id)
+
+        # Soma
+        soma_points = [point_id for point_id, point in points.items() if point[0] == 1]
+        if not soma_points:
+            raise ValueError(f"No soma points found in {self.swc_file}")
+        self.soma = self.add_section('soma')
+        if len(soma_points) == 1:
+            radius = points[soma_points[0]][4]
+            self.soma.L = self.soma.diam = 2 * radius
+        else:
+            for point_id in soma_points:
+                _, x, y, z, radius, _ = points[point_id]
+                self.soma.pt3d_add(x, y, z, 2 * radius)
+
+        # Neurites: start a new section at the soma, at roots, and after every branch point
+        self.dendrites = []
+        counters = {}
+        section_ends = {}  # last point id of a section -> section
+        stack = [point_id for point_id, point in points.items()
+                 if point[0] != 1 and (point[5] not in points or points[point[5]][0] == 1)]
+        stack.reverse()
+        while stack:
+            start_id = stack.pop()
+            section_type = points[start_id][0]
+            prefix = swc_section_names.get(section_type, 'dend')
+            counters[prefix] = counters.get(prefix, 0) + 1
+            sec = self.add_section(f'{prefix}{counters[prefix]}')
+
+            parent_id = points[start_id][5]
+            section_points = [start_id]
+            while len(children[section_points[-1]]) == 1 and points[children[section_points[-1]][0]][0] != 1:
+                section_points.append(children[section_points[-1]][0])
+
+            if parent_id in section_ends:
+                # include the branch point, so that the section starts where its parent ends
+                _, x, y, z, _, _ = points[parent_id]
+                sec.pt3d_add(x, y, z, 2 * points[start_id][4])
+            for point_id in section_points:
+                _, x, y, z, radius, _ = points[point_id]
+                sec.pt3d_add(x, y, z, 2 * radius)
+
+            if parent_id in section_ends:
+                sec.connect(section_ends[parent_id](1))
+            else:
+                sec.connect(self.soma(0.5))
+            section_ends[section_points[-1]] = sec
+            self.dendrites.append(sec)
+
+            branch_children = [child for child in children[section_points[-1]] if points[child][0] != 1]
+            stack.extend(reversed(branch_children))
+
+        if not self.dendrites:
+            raise ValueError(f"No neurites found in {self.swc_file}")
+
+
+class SyntheticModel(MorphologyModel):
+    """
+    Generates a random, reproducible dendritic tree with a given number of sections.
+
+    The soma has the geometry of SimpleModel's soma. Dendrites ('dend1', 'dend2', ...) are attached to the 1 end of a
+    randomly chosen section that has fewer than two children (the soma takes up to `max_primary` dendrites). Lengths
+    are drawn uniformly from `length_range`, and diameters taper by `taper` per branch order.
+
+    Args:
+        n_sections (int): Total number of sections including the soma.
+        seed (int): Seed of the random number generator.
+        length_range (tuple): Minimum and maximum dendrite length (um).
+        primary_diam (float): Diameter of the dendrites attached to the soma (um).
+        taper (float): Diameter ratio between a dendrite and its parent.
+        max_primary (int): Maximum number of dendrites attached to the soma.
+        d_lambda (float): Maximum segment length as a fraction of the length constant at `frequency`.
+        frequency (float): The frequency (Hz) used by the d_lambda rule.
+    """
+    def __init__(self, n_sections, seed=0, length_range=(20, 200), primary_diam=2, taper=0.8, max_primary=4,
+                 d_lambda=0.1, frequency=100):
+        if n_sections < 2:
+            raise ValueError(f"A synthetic model needs at least 2 sections, got {n_sections}")
+        self.n_sections = n_sections
+        self.seed = seed
+        self.length_range = length_range
+        self.primary_diam = primary_diam
+        self.taper = taper
+        self.max_primary = max_primary
+        super().__init__(d_lambda, frequency)
+
+    def topology(self):
+        rng = np.random.default_rng(self.seed)
+
+        self.soma = self.add_section('soma')
+        self.soma.L = self.soma.diam = 20
+
+        self.dendrites = []
+        # sections that can still take a child; full sections are swapped out in O(1)
+        candidates = [self.soma] if self.max_primary > 0 else []
+        n_children = {self.soma: 0}
+        for i in range(1, self.n_sections):
+            index = rng.integers(len(candidates))
+            parent = candidates[index]
+            n_children[parent] += 1
+            if n_children[parent] >= (self.max_primary if parent is self.soma else 2):
+                candidates[index] = candidates[-1]
+                candidates.pop()
+
+            dend = self.add_section(f'dend{i}')
+            dend.L = rng.uniform(*self.length_range)
+            dend.diam = self.primary_diam if parent is self.soma else max(parent.diam * self.taper, 0.3)
+            dend.connect(parent(1))
+            n_children[dend] = 0
+            candidates.append(dend)
+            self.dendrites.append(dend)
@@ -0,0 +1,103 @@
+from neuron import h
+
+from model_simulation.recording_utils.record_intrinsic import current_types as all_current_types
+
+
+class RecordingSpec:
+    """
+    Declares which variables, segments and time window `run_simulation` records.
+
+    Anything that is not selected is never allocated as an `h.Vector`. By default everything is recorded for the
+    whole simulation, which matches the behaviour of `run_simulation` without a specification.
+
+    Args:
+        current_types (list): Intrinsic current types to record (keys of `current_types` in `record_intrinsic`).
+                              None records all of them, an empty list records none.
+        sections (list): Names of the sections to record from (e.g. ['soma', 'dend1']).
+        segments (list): Names of individual segments to record from (e.g. ['dend2(0.5)']). If both `sections` and
+                         `segments` are None, every segment is recorded; otherwise their union is recorded.
+        record_voltage (bool): Whether to record membrane potentials (needed for axial currents).
+        record_synaptic (bool): Whether to record synaptic currents.
+        aggregate_synapses (bool): Whether to store synaptic currents per segment and synapse type (summed over the
+                                   synapses of the segment) instead of per synapse.
+        t_start (float): Start of the recording window in ms (default: 0).
+        t_stop (float): End of the recording window in ms (default: tstop). The simulation stops at the end of the
+                        window, as nothing is recorded afterwards.
+    """
+    def __init__(self, current_types=None, sections=None, segments=None, record_voltage=True, record_synaptic=True,
+                 aggregate_synapses=False, t_start=None, t_stop=None) -> None:
+        if current_types is not None:
+            unknown = set(current_types) - set(all_current_types)
+            if unknown:
+                raise ValueError(f"Invalid current types: {sorted(unknown)}")
+        if t_start is not None and t_stop is not None and t_start >= t_stop:
+            raise ValueError(f"Invalid recording window: [{t_start}, {t_stop}]")
+        self.current_types = current_types
+        self.sections = None if sections is None else set(sections)
+        self.segments = None if segments is None else set(segments)
+        self.record_voltage = record_voltage
+        self.record_synaptic = record_synaptic
+        self.aggregate_synapses = aggregate_synapses
+        self.t_start = t_start
+        self.t_stop = t_stop
+
+    def selected_current_types(self) -> dict:
+        """
+        Returns the subset of the intrinsic current types that should be recorded.
+
+        Returns:
+            dict: A dictionary mapping current type names to their NEURON reference attributes.
+        """
+        if self.current_types is None:
+            return dict(all_current_types)
+        return {current: ref for current, ref in all_current_types.items() if current in self.current_types}
+
+    def selects_all_segments(self) -> bool:
+        return self.sections is None and self.segments is None
+
+    def includes(self, seg) -> bool:
+        """
+        Checks whether a segment is selected for recording.
+
+        Parameters:
+            seg (object): A NEURON segment object.
+
+        Returns:
+            bool: True if the segment should be recorded.
+        """
+        if self.selects_all_segments():
+            return True
+        if self.sections is not None and seg.sec.name() in self.sections:
+            return True
+        return self.segments is not None and str(seg) in self.segments
+
+    def iter_segments(self):
+        """
+        Yields the selected segments (including the 0 and 1 end nodes) in `h.allsec()` order.
+
+        Yields:
+            object: A NEURON segment object.
+        """
+        for sec in h.allsec():
+            if self.selects_all_segments() or (self.sections is not None and sec.name() in self.sections):
+                yield from sec.allseg()
+            elif self.segments is not None:
+                for seg in sec.allseg():
+                    if str(seg) in self.segments:
+                        yield seg
+
+    def window(self, tstop: float) -> tuple:
+        """
+        Returns the recording window clipped to the simulation duration.
+
+        Parameters:
+            tstop (float): The simulation stop time (ms).
+
+        Returns:
+            tuple: (t_start, t_stop) in ms.
+        """
+        t_start = 0 if self.t_start is None else max(self.t_start, 0)
+        t_stop = tstop if self.t_stop is None else min(self.t_stop, tstop)
+        if t_start >= t_stop:
+            raise ValueError(f"Recording window [{t_start}, {t_stop}] is empty for tstop={tstop}")
+        return t_start, t_stop
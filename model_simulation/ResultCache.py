@@ -0,0 +1,162 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+
+from model_simulation.simulation import run_simulation
+from model_simulation.recording_utils.topology_cache import topology_hash
+
+# Keyword arguments of run_simulation that do not change the recorded data and are left out of the cache key
+ignored_parameters = ('chunk_duration', 'chunk_directory', 'topology_cache_dir', 'nthreads')
+
+
+def canonical(value):
+    """
+    Converts a value into a representation with a deterministic `repr`, for hashing.
+
+    Arrays are replaced by their dtype, shape and a digest of their contents, sets are sorted, and other objects
+    (e.g. RecordingSpec, WarmStart) are described by their class name and public attributes.
+
+    Parameters:
+        value (object): The value to convert.
+
+    Returns:
+        object: Nested tuples of plain values.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.dtype) or (isinstance(value, type) and issubclass(value, np.generic)):
+        return 'dtype', np.dtype(value).str
+    if isinstance(value, np.ndarray):
+        return 'ndarray', value.dtype.str, value.shape, hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((canonical(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), canonical(item)) for key, item in value.items()))
+    attributes = {key: item for key, item in vars(value).items() if not key.startswith('_')}
+    return type(value).__name__, canonical(attributes)
+
+
+def model_parameters(model) -> dict:
+    """
+    Returns the scalar parameters of a model (those set by `props` and the constructor arguments).
+    """
+    return {key: value for key, value in vars(model).items()
+            if value is None or isinstance(value, (bool, int, float, str, tuple))}
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of simulation results.
+
+    Results are stored under a hash of everything they depend on: the model class and parameters, the topology and
+    discretization (see `topology_hash`), the synapses of the model (see `SynapseRegistry.describe`) and the keyword
+    arguments of `run_simulation`. Calls with a matching key load the stored result instead of simulating again.
+
+    The cache is bounded by `max_bytes`: after every store, the least recently used results are evicted until the
+    total size fits. Results are materialized before they are stored, so chunked runs are cached as plain arrays.
+
+    Args:
+        directory (str): Directory of the cache files.
+        max_bytes (int): Maximum total size of the cached results (bytes).
+    """
+    def __init__(self, directory: str, max_bytes: int = 2 ** 30) -> None:
+        if max_bytes <= 0:
+            raise ValueError(f"Invalid cache size: {max_bytes}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, model, **simulation_kwargs) -> str:
+        """
+        Computes the cache key of a simulation.
+
+        Parameters:
+            model: The neuron model.
+            **simulation_kwargs: Keyword arguments of `run_simulation`.
+
+        Returns:
+            str: A hexadecimal digest identifying the simulation.
+        """
+        simulation_kwargs = {key: value for key, value in simulation_kwargs.items() if key not in ignored_parameters}
+        description = (type(model).__name__, canonical(model_parameters(model)), topology_hash(),
+                       canonical(model.synapses.describe()), canonical(simulation_kwargs))
+        return hashlib.sha256(repr(description).encode()).hexdigest()
+
+    def run_simulation(self, model, **simulation_kwargs):
+        """
+        Returns the cached result of a simulation, running (and storing) it only if it is not in the cache.
+
+        Parameters:
+            model: The neuron model.
+            **simulation_kwargs: Keyword arguments of `run_simulation`.
+
+        Returns:
+            SimulationResult: The simulation data.
+        """
+        path = self._path(self.key(model, **simulation_kwargs))
+        try:
+            with open(path, 'rb') as file:
+                simulation_data = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            simulation_data = None
+        if simulation_data is not None:
+            os.utime(path)  # mark as recently used
+            return simulation_data
+
+        simulation_data = run_simulation(model, **simulation_kwargs)
+        # write to a temporary file first, so that concurrent readers never see a partial result
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(simulation_data, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return simulation_data
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Removes the least recently used results until the cache fits into `max_bytes`.
+
+        Parameters:
+            keep (str): Path of a result that is never evicted (the one just stored).
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cached results (bytes).
+        """
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.endswith('.pkl'))
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
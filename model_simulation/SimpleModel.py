@@ -1,14 +1,12 @@
 from neuron import h
 
+from model_simulation.SynapseRegistry import SynapseRegistry
+
 
 class SimpleModel:
     def __init__(self):
-        # Initialize the synapse reference storage
-        self._syn_refs = []
-        self.AMPAlist = []
-        self.NMDAlist = []
-        self.GABAlist = []
-        self.GABA_Blist = []
+        # Initialize the synapse registry
+        self.synapses = SynapseRegistry()
 
         # Set up model
         props(self)
@@ -36,9 +34,11 @@ class SimpleModel:
         self.dend3.L, self.dend3.diam = 50, 1.5
         self.dend4.L, self.dend4.diam = 50, 1.5
 
+        self.dendrites = [self.dend1, self.dend2, self.dend3, self.dend4]
+
     def biophysics(self):
         # Set passive properties
-        for sec in [self.soma, self.dend1, self.dend2, self.dend3, self.dend4]:
+        for sec in [self.soma] + self.dendrites:
             sec.Ra = self.RA  # Axial resistance (ohm * cm)
             sec.cm = self.CM  # Membrane capacitance (uF/cm^2)
             sec.insert('pas')
@@ -56,22 +56,27 @@ class SimpleModel:
         self.soma.gkdrbar_kdr = self.gkdr_soma
 
         # dendrites
-        for dend in [self.dend1, self.dend2, self.dend3, self.dend4]:
+        for dend in self.dendrites:
             dend.insert('nad')
             dend.insert('kdr')
             dend.gbar_nad = self.gna_dend
             dend.gkdrbar_kdr = self.gkdr_dend
 
-    def add_synapse_ref(self, syn, stim, nc):
-        self._syn_refs.append((syn, stim, nc))
-        if syn.e == 0 and syn.tau1 == 0.1:  # AMPA
-            self.AMPAlist.append(syn)
-        elif syn.e == 0 and syn.tau1 == 2:  # NMDA
-            self.NMDAlist.append(syn)
-        elif syn.e == -65:  # GABA fast
-            self.GABAlist.append(syn)
-        elif syn.e == -80:  # GABA slow
-            self.GABA_Blist.append(syn)
+    @property
+    def AMPAlist(self):
+        return self.synapses.get_synapses('AMPA')
+
+    @property
+    def NMDAlist(self):
+        return self.synapses.get_synapses('NMDA')
+
+    @property
+    def GABAlist(self):
+        return self.synapses.get_synapses('GABAfast')
+
+    @property
+    def GABA_Blist(self):
+        return self.synapses.get_synapses('GABAslow')
 
 def props(model):
     # Passive properties
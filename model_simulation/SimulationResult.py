@@ -0,0 +1,142 @@
+import numpy as np
+
+from model_simulation.recording_utils.convert_vectors import vector_to_array, stop_recording
+from model_simulation.recording_utils.record_membrane_potential import preprocess_membrane_potential_data
+from model_simulation.recording_utils.record_intrinsic import preprocess_intrinsic_data
+from model_simulation.recording_utils.record_synaptic import preprocess_synaptic_data
+
+
+class SimulationResult:
+    """
+    Holds the recordings of a simulation and converts them to NumPy arrays lazily.
+
+    The recorded `h.Vector` objects stop recording when the result is created (without a copy), so later runs in the
+    same process cannot overwrite or resize them. They are kept until a block (time axis, membrane potential,
+    intrinsic or synaptic currents) is first accessed. The block is then copied once into a preallocated 2D array,
+    cached, and the references to the NEURON vectors are released. Blocks that are never accessed are never
+    converted.
+
+    Segments are identified by their integer node ids (rows of `segment_table`, see `build_segment_table`); segment
+    names are only produced by the preprocessors for their output.
+
+    For backward compatibility the result can be indexed like the former `simulation_data` dictionary, e.g.
+    `result['membrane_potential_data']` returns `[segment ids, values]`.
+
+    Args:
+        t (h.Vector): The recorded time vector.
+        v_segments (np.ndarray): Node ids of the segments where the membrane potential was recorded.
+        v (list): `h.Vector` objects with the recorded membrane potentials.
+        intrinsic_segments (dict): Keys are current types, values are arrays of node ids (a single id for a current
+                                   recorded with a single vector, e.g. the injected current).
+        intrinsic_currents (dict): Keys are current types, values are lists of `h.Vector` objects.
+        synaptic_segments (dict): Keys are synapse types, values are arrays of node ids.
+        synaptic_currents (dict): Keys are synapse types, values are lists of `h.Vector` objects.
+        connections (pd.DataFrame): The connection table ('ref', 'par', 'ri').
+        areas (pd.DataFrame): The segment areas.
+        segment_table (pd.DataFrame): The integer-coded nodes of the model (see `build_segment_table`).
+        aggregate_synapses (bool): Whether synaptic currents recorded from the same segment are summed into one row.
+        dtype (np.dtype): The dtype the recorded currents are converted to. The time axis and the membrane potentials
+                          are always float64 (axial currents are computed from small differences of potentials).
+    """
+    __slots__ = ('connections', 'areas', 'segment_table', '_n_samples', '_aggregate_synapses', '_dtype', '_raw',
+                 '_blocks')
+
+    _keys = ('membrane_potential_data', 'intrinsic_data', 'synaptic_data', 'taxis', 'connections', 'areas',
+             'segment_table')
+
+    def __init__(self, t, v_segments, v, intrinsic_segments, intrinsic_currents, synaptic_segments,
+                 synaptic_currents, connections, areas, segment_table=None, aggregate_synapses=False,
+                 dtype=np.float64) -> None:
+        self.connections = connections
+        self.areas = areas
+        self.segment_table = segment_table
+        self._n_samples = len(t)
+        self._aggregate_synapses = aggregate_synapses
+        self._dtype = np.dtype(dtype)
+        stop_recording(t, v, intrinsic_currents, synaptic_currents)
+        self._raw = {'taxis': t,
+                     'membrane_potential_data': (v_segments, v),
+                     'intrinsic_data': (intrinsic_segments, intrinsic_currents),
+                     'synaptic_data': (synaptic_segments, synaptic_currents)}
+        self._blocks = {}
+
+    @property
+    def n_samples(self) -> int:
+        """Number of recorded time points."""
+        return self._n_samples
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the recorded currents."""
+        return self._dtype
+
+    @property
+    def taxis(self):
+        """The time axis as a 1D array."""
+        return self._get_block('taxis')
+
+    @property
+    def membrane_potential_data(self) -> list:
+        """[segment ids, values] of the recorded membrane potentials."""
+        return self._get_block('membrane_potential_data')
+
+    @property
+    def intrinsic_data(self) -> list:
+        """[segment ids, values] dictionaries of the recorded intrinsic currents, keyed by current type."""
+        return self._get_block('intrinsic_data')
+
+    @property
+    def synaptic_data(self) -> list:
+        """[segment ids, values] dictionaries of the recorded synaptic currents, keyed by synapse type."""
+        return self._get_block('synaptic_data')
+
+    def _get_block(self, name: str):
+        if name not in self._blocks:
+            raw = self._raw[name]
+            if name == 'taxis':
+                block = vector_to_array(raw)
+            elif name == 'membrane_potential_data':
+                block = list(preprocess_membrane_potential_data(*raw, n_samples=self._n_samples, dtype=np.float64))
+            elif name == 'intrinsic_data':
+                block = list(preprocess_intrinsic_data(*raw, n_samples=self._n_samples, dtype=self._dtype))
+            else:
+                block = list(preprocess_synaptic_data(*raw, n_samples=self._n_samples,
+                                                      aggregate=self._aggregate_synapses, dtype=self._dtype))
+            self._blocks[name] = block
+            # only dropped once the conversion succeeded
+            del self._raw[name]
+        return self._blocks[name]
+
+    def materialize(self) -> 'SimulationResult':
+        """
+        Converts all remaining blocks and releases every reference to NEURON objects.
+
+        Returns:
+            SimulationResult: The result itself.
+        """
+        for name in list(self._raw):
+            self._get_block(name)
+        return self
+
+    def keys(self) -> tuple:
+        return self._keys
+
+    def __getitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __getstate__(self) -> dict:
+        # NEURON segments cannot be pickled, so convert everything before the result leaves the process
+        self.materialize()
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        # not stored by earlier versions
+        self.segment_table = None
+        self._dtype = np.dtype(np.float64)
+        for slot, value in state.items():
+            setattr(self, slot, value)
@@ -0,0 +1,113 @@
+import numpy as np
+
+from model_simulation.recording_utils.extract_connections import node_index
+
+# Synapse types known to the registry
+synapse_types = ('AMPA', 'NMDA', 'GABAfast', 'GABAslow')
+
+
+def segment_key(seg):
+    """
+    Returns a hashable key identifying the node a segment (or point process location) belongs to.
+
+    Parameters:
+        seg (object): A NEURON segment object.
+
+    Returns:
+        tuple: (section, node index in `sec.allseg()`).
+    """
+    return seg.sec, node_index(seg.sec, seg.x)
+
+
+class SynapseRegistry:
+    """
+    Keeps track of the synapses of a model by type and by segment.
+
+    Synapses are registered with their type explicitly instead of being classified from their parameters.
+    Shared synapses are single point processes standing in for all synapses of one type on one segment (driven by
+    several NetCons). Because the synaptic mechanisms are linear in the synaptic weight, this is equivalent to
+    placing the synapses separately, while creating and recording only one point process per segment and type.
+    """
+    def __init__(self) -> None:
+        self._synapses = {syn_type: [] for syn_type in synapse_types}
+        self._by_segment = {syn_type: {} for syn_type in synapse_types}
+        self._shared = {}
+        self._refs = []
+        self._first_event = None
+        self._placements = []
+
+    def register(self, syn_type, syn, refs=(), shared=False) -> None:
+        """
+        Registers a synapse point process.
+
+        Parameters:
+            syn_type (str): Synapse type ('AMPA', 'NMDA', 'GABAfast', 'GABAslow').
+            syn (object): The synapse point process.
+            refs (iterable): Objects to keep alive together with the synapse (e.g. NetStim, NetCon).
+            shared (bool): Whether the synapse is the shared synapse of its segment and type.
+        """
+        if syn_type not in self._synapses:
+            raise ValueError(f"Invalid synapse type: {syn_type}")
+        key = segment_key(syn.get_segment())
+        self._synapses[syn_type].append(syn)
+        self._by_segment[syn_type].setdefault(key, []).append(syn)
+        if shared:
+            self._shared[(syn_type, key)] = syn
+        self.keep(*refs)
+
+    def keep(self, *refs) -> None:
+        # Store references in the registry to prevent GC
+        self._refs.extend(refs)
+
+    def add_event_times(self, times) -> None:
+        """
+        Records the times (ms) at which synapses are activated (used to find the stimulus onset).
+        """
+        times = np.asarray(times, dtype=float)
+        if times.size:
+            first_event = float(times.min())
+            self._first_event = first_event if self._first_event is None else min(self._first_event, first_event)
+
+    def first_event_time(self):
+        """
+        Returns the earliest synaptic activation time (ms), or None if no synaptic events are scheduled.
+        """
+        return self._first_event
+
+    def add_placement(self, description) -> None:
+        """
+        Records the arguments a set of synapses was placed with (used to identify the synaptic input of a model).
+        """
+        self._placements.append(description)
+
+    def describe(self) -> list:
+        """
+        Describes the synaptic input of the model: how the synapses were placed and where each synapse sits.
+
+        Returns:
+            list: The recorded placements followed by (type, segment name) for every registered synapse.
+        """
+        locations = [(syn_type, str(syn.get_segment()))
+                     for syn_type, synapses in self._synapses.items() for syn in synapses]
+        return self._placements + locations
+
+    def get_shared(self, syn_type, seg):
+        """
+        Returns the shared synapse of a given type on the segment, or None if there is none yet.
+        """
+        return self._shared.get((syn_type, segment_key(seg)))
+
+    def get_synapses(self, syn_type) -> list:
+        """
+        Returns all synapse point processes of a type, in registration order.
+        """
+        return self._synapses[syn_type]
+
+    def by_segment(self, syn_type) -> dict:
+        """
+        Returns the synapse point processes of a type grouped by segment.
+
+        Returns:
+            dict: Keys are segment keys (see `segment_key`), values are lists of synapse point processes.
+        """
+        return self._by_segment[syn_type]
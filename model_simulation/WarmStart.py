@@ -0,0 +1,127 @@
+import os
+import hashlib
+from neuron import h
+
+from model_simulation.ResultCache import canonical
+
+
+def synaptic_input_key(model) -> str:
+    """
+    Returns a digest of the synaptic input of a model (placements, spike times and synapse locations, see
+    `SynapseRegistry.describe`).
+    """
+    return hashlib.sha256(repr(canonical(model.synapses.describe())).encode()).hexdigest()
+
+
+class WarmStart:
+    """
+    Snapshot of the model state at the stimulus onset, shared by runs with an identical pre-stimulus period.
+
+    The first run using a WarmStart initializes the model, simulates up to `t_onset` and saves the state with
+    `SaveState`. Later runs restore that state and only simulate from `t_onset` on. If `state_file` is given, the
+    snapshot is also written to disk, so that runs in other processes (e.g. sweep workers) can restore it.
+
+    All runs sharing a snapshot must use the same model structure (sections, mechanisms, synapses and the current
+    clamp of `run_simulation`), and nothing may differ between them before `t_onset`: the current injection and all
+    synaptic events must start at or after the onset. Recordings start at the onset.
+
+    The snapshot also holds the event queue and the state of the spike sources (NetStim, VecStim), so restoring it
+    replays the synaptic events of the run that saved it. The synaptic input of that run (see `synaptic_input_key`)
+    is therefore stored with the snapshot, and runs with a different synaptic input (e.g. other spike times) raise
+    a ValueError instead of silently receiving the saved events.
+
+    Args:
+        t_onset (float): Time (ms) of the snapshot, e.g. the current clamp delay or the first synaptic event.
+        state_file (str): Optional path of the snapshot on disk.
+    """
+    def __init__(self, t_onset: float, state_file: str = None) -> None:
+        if t_onset <= 0:
+            raise ValueError(f"Invalid warm start onset: {t_onset}")
+        self.t_onset = t_onset
+        self.state_file = state_file
+        self._state = None
+        self._input_key = None
+
+    @classmethod
+    def at_stimulus_onset(cls, model, delay: float, state_file: str = None) -> 'WarmStart':
+        """
+        Creates a WarmStart at the earliest stimulus: the current clamp delay or the first synaptic event.
+
+        Parameters:
+            model: The neuron model (with a synapse registry).
+            delay (float): Onset of the current injection (ms).
+            state_file (str): Optional path of the snapshot on disk.
+
+        Returns:
+            WarmStart: The warm start object.
+        """
+        first_event = model.synapses.first_event_time()
+        t_onset = delay if first_event is None else min(delay, first_event)
+        return cls(t_onset, state_file)
+
+    def initialize(self, v_init: float, model) -> None:
+        """
+        Brings the model to `t_onset`, either by restoring the snapshot or by simulating and saving it.
+
+        Parameters:
+            v_init (float): The initial membrane potential (mV).
+            model: The neuron model (with a synapse registry).
+        """
+        input_key = synaptic_input_key(model)
+        state = self._load()
+        if state is not None and input_key != self._input_key:
+            raise ValueError("The synaptic input differs from the input the warm start snapshot was saved with; "
+                             "restoring it would replay the saved synaptic events")
+        h.finitialize(v_init)
+        if state is None:
+            h.continuerun(self.t_onset)
+            state = h.SaveState()
+            state.save()
+            self._state = state
+            self._input_key = input_key
+            self._write(state)
+        else:
+            state.restore()
+            if h.CVode().active():
+                h.CVode().re_init()
+
+    def _load(self):
+        if self._state is None and self.state_file is not None and os.path.exists(self.state_file):
+            state = h.SaveState()
+            state_file = h.File()
+            state_file.ropen(self.state_file)
+            state.fread(state_file)
+            state_file.close()
+            self._state = state
+            input_file = f'{self.state_file}.input'
+            if os.path.exists(input_file):
+                with open(input_file) as file:
+                    self._input_key = file.read().strip()
+        return self._state
+
+    def _write(self, state) -> None:
+        if self.state_file is None:
+            return
+        # the synaptic input is written first, so that it exists whenever the snapshot does
+        tmp_file = f'{self.state_file}.input.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as file:
+            file.write(self._input_key)
+        os.replace(tmp_file, f'{self.state_file}.input')
+
+        # write to a temporary file first, so that concurrent readers never see a partial snapshot
+        tmp_file = f'{self.state_file}.{os.getpid()}.tmp'
+        state_file = h.File()
+        state_file.wopen(tmp_file)
+        state.fwrite(state_file)
+        state_file.close()
+        os.replace(tmp_file, self.state_file)
+
+    def __getstate__(self) -> dict:
+        # SaveState objects cannot be pickled; other processes restore the snapshot from `state_file`
+        return {'t_onset': self.t_onset, 'state_file': self.state_file}
+
+    def __setstate__(self, state: dict) -> None:
+        self.t_onset = state['t_onset']
+        self.state_file = state['state_file']
+        self._state = None
+        self._input_key = None
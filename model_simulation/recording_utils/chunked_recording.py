@@ -0,0 +1,94 @@
+import os
+import numpy as np
+
+from model_simulation.recording_utils.convert_vectors import vector_to_array, stack_vectors, collect_vectors
+
+
+def get_recording_blocks(t, v, intrinsic_currents, synaptic_currents):
+    """
+    Groups the recorded vectors into named blocks that are flushed to disk together.
+
+    Parameters:
+        t (h.Vector): The recorded time vector.
+        v (list): `h.Vector` objects with the recorded membrane potentials.
+        intrinsic_currents (dict): Keys are current types, values are lists of `h.Vector` objects (or a single vector).
+        synaptic_currents (dict): Keys are synapse types, values are lists of `h.Vector` objects.
+
+    Returns:
+        dict: Keys are block names, values are single vectors or lists of vectors.
+    """
+    blocks = {'taxis': t, 'membrane_potential': v}
+    for current_type, vectors in intrinsic_currents.items():
+        blocks[f'intrinsic_{current_type}'] = vectors
+    for synapse_type, vectors in synaptic_currents.items():
+        blocks[f'synaptic_{synapse_type}'] = vectors
+    return blocks
+
+
+def flush_chunk(directory, chunk_index, blocks, dtype=np.float64):
+    """
+    Writes the data recorded since the last flush to disk and empties the recording vectors.
+
+    Each block is saved as '<block>_<chunk_index>.npy'. Resizing the vectors to zero keeps the memory used by the
+    recordings bounded by the length of a single chunk.
+
+    Parameters:
+        directory (str): The directory where the chunk files are written.
+        chunk_index (int): The index of the chunk.
+        blocks (dict): Recording blocks as returned by `get_recording_blocks`.
+        dtype (np.dtype): The dtype of the recorded currents (the time axis and the membrane potentials are always
+                          stored as float64).
+    """
+    n_samples = len(blocks['taxis'])
+    for name, vectors in blocks.items():
+        if name == 'taxis':
+            array = vector_to_array(vectors)
+        elif name == 'membrane_potential':
+            array = stack_vectors(vectors, n_samples)
+        elif isinstance(vectors, list):
+            array = stack_vectors(vectors, n_samples, dtype)
+        else:
+            array = vector_to_array(vectors, dtype)
+        np.save(os.path.join(directory, f'{name}_{chunk_index}.npy'), array)
+
+    for vec in collect_vectors(*blocks.values()):
+        vec.resize(0)
+
+
+def merge_chunks(directory, names, n_chunks):
+    """
+    Concatenates the chunk files of each block along the time axis into a single memory-mapped .npy file.
+
+    Chunks are copied one at a time, so memory use stays bounded by the size of a single chunk. The chunk files are
+    removed afterwards.
+
+    Parameters:
+        directory (str): The directory containing the chunk files.
+        names (iterable): The block names.
+        n_chunks (int): The number of chunks written for every block.
+
+    Returns:
+        dict: Keys are block names, values are read-only memory-mapped arrays (time is the last axis).
+    """
+    arrays = {}
+    for name in names:
+        chunk_files = [os.path.join(directory, f'{name}_{i}.npy') for i in range(n_chunks)]
+        chunk_shapes = [np.load(chunk_file, mmap_mode='r').shape for chunk_file in chunk_files]
+        n_samples = sum(chunk_shape[-1] for chunk_shape in chunk_shapes)
+        dtype = np.load(chunk_files[0], mmap_mode='r').dtype
+
+        output_file = os.path.join(directory, f'{name}.npy')
+        merged = np.lib.format.open_memmap(output_file, mode='w+', dtype=dtype,
+                                           shape=chunk_shapes[0][:-1] + (n_samples,))
+        start_idx = 0
+        for chunk_file, chunk_shape in zip(chunk_files, chunk_shapes):
+            end_idx = start_idx + chunk_shape[-1]
+            merged[..., start_idx:end_idx] = np.load(chunk_file)
+            start_idx = end_idx
+        merged.flush()
+        del merged
+
+        for chunk_file in chunk_files:
+            os.remove(chunk_file)
+        arrays[name] = np.load(output_file, mmap_mode='r')
+    return arrays
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def vector_to_array(vec, dtype=np.float64):
+    """
+    Copies a single recorded `h.Vector` into a NumPy array.
+
+    The data is read through the zero-copy `Vector.as_numpy()` view and copied exactly once, so the returned array
+    stays valid after the vector is resized or freed.
+
+    Parameters:
+        vec (h.Vector): The recorded vector (or an already converted array).
+        dtype (np.dtype): The dtype of the returned array.
+
+    Returns:
+        np.ndarray: A 1D array containing the recorded data.
+    """
+    if isinstance(vec, np.ndarray):
+        # already converted (e.g. flushed to disk); avoid copying memory-mapped data
+        return np.asarray(vec, dtype=dtype)
+    return np.array(vec.as_numpy(), dtype=dtype)
+
+
+def stack_vectors(vectors, n_samples, dtype=np.float64):
+    """
+    Copies a list of recorded `h.Vector` objects into a preallocated 2D array (one row per vector).
+
+    Parameters:
+        vectors (list): A list of `h.Vector` objects of equal length (or an already stacked array).
+        n_samples (int): The number of recorded samples (used to shape the block when `vectors` is empty).
+        dtype (np.dtype): The dtype of the returned array.
+
+    Returns:
+        np.ndarray: An array of shape (len(vectors), n_samples).
+    """
+    if isinstance(vectors, np.ndarray):
+        # already converted (e.g. flushed to disk); avoid copying memory-mapped data
+        return np.asarray(vectors, dtype=dtype)
+    block = np.empty((len(vectors), n_samples), dtype=dtype)
+    for i, vec in enumerate(vectors):
+        block[i, :] = vec.as_numpy()
+    return block
+
+
+def collect_vectors(*recordings):
+    """
+    Flattens recorded vectors stored in lists and dictionaries into a single list.
+
+    Parameters:
+        *recordings: `h.Vector` objects, lists of vectors, or dictionaries whose values are vectors or lists of vectors.
+
+    Returns:
+        list: All `h.Vector` objects found in the recordings.
+    """
+    vectors = []
+    for recording in recordings:
+        if isinstance(recording, dict):
+            vectors.extend(collect_vectors(*recording.values()))
+        elif isinstance(recording, list):
+            vectors.extend(recording)
+        else:
+            vectors.append(recording)
+    return vectors
+
+
+def stop_recording(*recordings) -> None:
+    """
+    Stops recording into vectors without copying them (`Vector.play_remove()`).
+
+    Vectors that no longer record keep the data of a finished run when the next run starts; `finitialize` only
+    resizes and overwrites vectors that are still recording.
+
+    Parameters:
+        *recordings: `h.Vector` objects, lists or dictionaries of them (see `collect_vectors`). Already converted
+                     arrays are skipped.
+    """
+    for vec in collect_vectors(*recordings):
+        if not isinstance(vec, np.ndarray):
+            vec.play_remove()
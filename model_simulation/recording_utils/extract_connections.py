@@ -1,87 +1,162 @@
+import numpy as np
 import pandas as pd
-import networkx as nx
 from neuron import h
 
 
-def get_external_connections():
-    ref_external = []
-    par_external = []
-    ri_external = []
+def node_index(sec, x):
+    """
+    Returns the index in `sec.allseg()` of the node at position x: the 0 end, the centre of the segment containing x,
+    or the 1 end.
 
-    for sec in h.allsec():
-        counter = 0
-        for seg in sec:
-            if counter < 1:
-                ref_external.append(seg)
-                par_external.append(sec.parentseg())
-                try:
-                    ri_external.append(seg.ri())
-                    counter += 1
-                except:
-                    print(f"The following section does not have a parent: {sec}")
-                    ri_external.append(-1)
-                    counter += 1
-                    continue
-
-    connections_external = pd.DataFrame()
-    connections_external["ref"] = ref_external
-    connections_external["par"] = par_external
-    connections_external["ri"] = ri_external
-    connections_external['ref'] = connections_external['ref'].astype(str)
-    connections_external['par'] = connections_external['par'].astype(str)
-    connections_external['ri'] = connections_external['ri'].astype(float)
-
-    return connections_external
-
-
-def get_internal_connections():
-    ref_internal = []
-    par_internal = []
-    ri_internal = []
+    Parameters:
+        sec (h.Section): The section.
+        x (float): Position along the section (0-1).
+
+    Returns:
+        int: The node index.
+    """
+    if x == 0:
+        return 0
+    if x == 1:
+        return sec.nseg + 1
+    return min(int(x * sec.nseg), sec.nseg - 1) + 1
+
+
+def get_node_offsets():
+    """
+    Returns the id of the first node (the 0 end) of every section, following the `h.allsec()` / `sec.allseg()`
+    order of `build_segment_table`.
 
+    Returns:
+        dict: Keys are sections, values are node ids.
+    """
+    node_offsets = {}
+    n_nodes = 0
     for sec in h.allsec():
-        segments = []
+        node_offsets[sec] = n_nodes
+        n_nodes += sec.nseg + 2
+    return node_offsets
+
+
+def get_node_ids(segments, node_offsets=None):
+    """
+    Returns the node ids (see `build_segment_table`) of NEURON segments, without converting them to names.
+
+    Parameters:
+        segments (iterable): Segment objects (e.g. recorded segments or `syn.get_segment()`).
+        node_offsets (dict): Optional result of `get_node_offsets`, to reuse it for several lists of segments.
+
+    Returns:
+        np.ndarray: The node id of every segment.
+    """
+    if node_offsets is None:
+        node_offsets = get_node_offsets()
+    return np.array([node_offsets[seg.sec] + node_index(seg.sec, seg.x) for seg in segments], dtype=np.int64)
+
+
+def get_parent_node(sec):
+    """
+    Returns the node a section is electrically attached to in its parent section.
+
+    `sec.parentseg()` reports the connection position `x` as given in `connect`, which is not necessarily a node.
+    A child attached at 0 < x < 1 is attached to the centre of the parent segment that contains x. A child attached
+    to the 0 end of a non-root parent shares the node that parent is attached to (its true parent segment), so the
+    tree is walked up until a real node is found.
+
+    Parameters:
+        sec (h.Section): The section.
+
+    Returns:
+        tuple or None: (parent section, index of the node in `parent.allseg()`), or None for a root section.
+    """
+    parent = sec.parentseg()
+    while parent is not None and parent.x == 0 and parent.sec.parentseg() is not None:
+        parent = parent.sec.parentseg()
+    if parent is None:
+        return None
+
+    return parent.sec, node_index(parent.sec, parent.x)
+
+
+def build_connections():
+    """
+    Builds the connection table of all segments in a single pass over the section tree.
+
+    Every node (including the 0 and 1 ends) gets an integer id following the `h.allsec()` / `sec.allseg()` order,
+    which is also the order in which membrane potentials are recorded. Each segment centre and 1 end is connected
+    to the preceding node of its section; the first segment of a section is connected to the parent node returned
+    by `get_parent_node`, so no morphology-specific corrections are needed. The first segment of the root section
+    has no parent ('None', id -1).
+
+    Returns:
+        pd.DataFrame: A DataFrame with the columns 'ref', 'par', 'ri' (segment names and the axial resistance
+                      between them, in MOhm), and 'ref_id', 'par_id' (integer node ids).
+    """
+    sections = list(h.allsec())
+    section_nodes = [list(sec.allseg()) for sec in sections]
+    node_offsets = {}
+    node_names = []
+    for sec, nodes in zip(sections, section_nodes):
+        node_offsets[sec] = len(node_names)
+        node_names.extend(str(seg) for seg in nodes)
+
+    ref_ids = []
+    par_ids = []
+    ri = []
+    for sec, nodes in zip(sections, section_nodes):
+        offset = node_offsets[sec]
+        parent_node = get_parent_node(sec)
+        for i in range(1, len(nodes)):
+            ref_ids.append(offset + i)
+            if i > 1:
+                par_ids.append(offset + i - 1)
+            elif parent_node is None:
+                par_ids.append(-1)
+            else:
+                par_ids.append(node_offsets[parent_node[0]] + parent_node[1])
+            try:
+                ri.append(nodes[i].ri())
+            except Exception:
+                print(f"The following section does not have a parent: {sec}")
+                ri.append(-1)
+
+    ref_ids = np.array(ref_ids, dtype=np.int64)
+    par_ids = np.array(par_ids, dtype=np.int64)
+    names = np.array(node_names + ['None'], dtype=object)  # id -1 selects 'None'
+
+    connections = pd.DataFrame()
+    connections['ref'] = names[ref_ids]
+    connections['par'] = names[par_ids]
+    connections['ri'] = np.array(ri, dtype=float)
+    connections['ref_id'] = ref_ids
+    connections['par_id'] = par_ids
+    return connections
+
+
+def build_segment_table():
+    """
+    Builds the table of all nodes (segment centres and the 0 and 1 ends of every section) with integer ids.
+
+    Node ids follow the same `h.allsec()` / `sec.allseg()` order as the ids of `build_connections`.
+
+    Returns:
+        pd.DataFrame: A DataFrame indexed by node id with the columns 'segment' (name), 'section' (section name),
+                      'section_id' (integer section id) and 'x' (position along the section).
+    """
+    segments = []
+    sections = []
+    section_ids = []
+    xs = []
+    for section_id, sec in enumerate(h.allsec()):
+        name = sec.name()
         for seg in sec.allseg():
-            segments.append(seg)
-
-        for i, _ in enumerate(segments):
-            if i > 0:
-                ref_internal.append(segments[i])
-                par_internal.append(segments[i - 1])
-                ri_internal.append(segments[i].ri())
-
-    connections_internal = pd.DataFrame()
-    connections_internal["ref"] = ref_internal
-    connections_internal["par"] = par_internal
-    connections_internal["ri"] = ri_internal
-    connections_internal['ref'] = connections_internal['ref'].astype(str)
-    connections_internal['par'] = connections_internal['par'].astype(str)
-    connections_internal['ri'] = connections_internal['ri'].astype(float)
-    return connections_internal
-
-
-def get_connections(connections_external, connections_internal):
-    connections = connections_internal.copy()
-    for index, row in connections_external.iterrows():
-        ref = row["ref"]
-        par = row["par"]
-        ri = row["ri"]
-
-        connections.loc[connections["ref"] == ref, "par"] = par
-        connections.loc[connections["ref"] == ref, "ri"] = ri
-
-    # the following 3 lines are for sanity check
-    # G = nx.from_pandas_edgelist(connections, source='par', target='ref')
-    # connected_components = list(nx.connected_components(G))
-    # print(f"Number of graphs originally: {len(connected_components)}")
-
-    # issue 1: dend2_0(0.5),soma(0.709232),0.15333 -> this is connected to soma(0.833333) in practice
-    # issue 2: dend3_0(0.5),soma(0.443475),0.05747 -> this is connected to soma(0.5) in practice
-    connections.loc[connections["ref"] == "dend2_0(0.5)", "par"] = "soma(0.833333)"
-    connections.loc[connections["ref"] == "dend3_0(0.5)", "par"] = "soma(0.5)"
-
-    # the following 3 lines are for sanity check
-    # G_corrected = nx.from_pandas_edgelist(connections, source='par', target='ref')
-    # connected_components_corrected = list(nx.connected_components(G_corrected))
-    # print(f"Number of graph components after correction: {len(connected_components_corrected)}")
-    return connections
\ No newline at end of file
+            segments.append(str(seg))
+            sections.append(name)
+            section_ids.append(section_id)
+            xs.append(seg.x)
+
+    segment_table = pd.DataFrame({'segment': segments, 'section': sections,
+                                  'section_id': np.array(section_ids, dtype=np.int32),
+                                  'x': np.array(xs, dtype=float)})
+    segment_table.index.name = 'id'
+    return segment_table
@@ -1,6 +1,9 @@
 import numpy as np
 from neuron import h
 
+from model_simulation.recording_utils.record_membrane_potential import record_reference
+from model_simulation.recording_utils.convert_vectors import vector_to_array, stack_vectors
+
 # Dictionary mapping current types to their corresponding NEURON attributes
 current_types = {
         'nax': '_ref_ina_nax',
@@ -15,13 +18,14 @@ current_types = {
     }
 
 
-def measure_intrinsic(seg, current_types):
+def measure_intrinsic(seg, current_types, tvec=None):
     """
     Measures intrinsic currents in a given segment.
 
     Parameters:
         seg (object): A NEURON segment object to record from.
         current_types (dict): A dictionary mapping current type names to their NEURON reference attributes.
+        tvec (h.Vector): Optional time vector to sample the currents on.
 
     Returns:
         dict: A dictionary where keys are current types and values are recorded `h.Vector` objects containing the data.
@@ -29,39 +33,56 @@ def measure_intrinsic(seg, current_types):
     recorded_vectors = {}
     for current, ref_attr in current_types.items():
         if hasattr(seg, ref_attr):
-            vec = h.Vector()
-            vec.record(getattr(seg, ref_attr))
-            recorded_vectors[current] = vec
+            recorded_vectors[current] = record_reference(getattr(seg, ref_attr), tvec, seg.sec)
     return recorded_vectors
 
 
-def record_intrinsic_currents():
+def record_intrinsic_currents(tvec=None, segments=None, types=None):
     """
     Records intrinsic currents for all segments in all sections of the NEURON model.
     Iterates through all segments in all sections and records intrinsic currents based on the defined current types.
 
+    Parameters:
+        tvec (h.Vector): Optional time vector to sample the currents on.
+        segments (iterable): Optional subset of segments to record from (default: all segments of all sections).
+        types (dict): Optional subset of `current_types` to record (default: all current types).
+
     Returns:
         tuple:
             - intrinsic_segments (dict): Keys are current types, and values are lists of segments where the current type is present.
             - intrinsic_currents (dict): Keys are current types, and values are lists of `h.Vector` objects for the recorded data.
     """
-    intrinsic_currents = {current: [] for current in current_types}
-    intrinsic_segments = {current: [] for current in current_types}
+    if types is None:
+        types = current_types
+    intrinsic_currents = {current: [] for current in types}
+    intrinsic_segments = {current: [] for current in types}
+
+    if segments is None:
+        segments = (seg for sec in h.allsec() for seg in sec.allseg())
+    if not types:
+        return intrinsic_segments, intrinsic_currents
 
-    for sec in h.allsec():
-        for seg in sec.allseg():
-            recorded = measure_intrinsic(seg, current_types)
-            for current, vec in recorded.items():
-                intrinsic_currents[current].append(vec)
-                intrinsic_segments[current].append(seg)
+    for seg in segments:
+        recorded = measure_intrinsic(seg, types, tvec)
+        for current, vec in recorded.items():
+            intrinsic_currents[current].append(vec)
+            intrinsic_segments[current].append(seg)
     return intrinsic_segments, intrinsic_currents
 
-def preprocess_intrinsic_data(intrinsic_segments, intrinsic_currents):
+def preprocess_intrinsic_data(intrinsic_segments, intrinsic_currents, n_samples=None, dtype=np.float64):
+    # segments are node ids (see `get_node_ids`)
     segment_dict = {}
     current_dict = {}
     for current_type in intrinsic_segments.keys():
-        segments_array = np.array(intrinsic_segments[current_type]).astype('str')
-        currents_array = np.array(intrinsic_currents[current_type])
+        segments_array = np.asarray(intrinsic_segments[current_type], dtype=np.int64)
+        currents = intrinsic_currents[current_type]
+        if segments_array.ndim == 1:
+            # one vector per segment
+            length = n_samples if n_samples is not None else (len(currents[0]) if len(currents) else 0)
+            currents_array = stack_vectors(currents, length, dtype)
+        else:
+            # single vector (e.g. injected current)
+            currents_array = vector_to_array(currents, dtype)
 
         segment_dict[current_type] = segments_array
         current_dict[current_type] = currents_array
@@ -1,15 +1,46 @@
 from neuron import h
 import numpy as np
 
+from model_simulation.recording_utils.convert_vectors import stack_vectors
 
-def record_time_vector():
+
+def record_reference(ref, tvec=None, sec=None):
+    """
+    Records a NEURON variable reference into a new `h.Vector`.
+
+    Parameters:
+        ref (object): A NEURON variable reference (e.g. `seg._ref_v`).
+        tvec (h.Vector): Optional time vector. If given, the variable is sampled only at these time points
+                         (record-with-time-vector), otherwise at every integration step.
+        sec (h.Section): Optional section the variable belongs to. Lets NEURON assign the recording to the right
+                         thread when the simulation runs on multiple threads.
+
+    Returns:
+        h.Vector: The recording vector.
+    """
+    vec = h.Vector()
+    kwargs = {} if sec is None else {'sec': sec}
+    if tvec is None:
+        vec.record(ref, **kwargs)
+    else:
+        vec.record(ref, tvec, **kwargs)
+    return vec
+
+
+def record_time_vector(tvec=None):
+    if tvec is not None:
+        return tvec
     t = h.Vector().record(h._ref_t)
     return t
 
-def record_membrane_potential():
+def record_membrane_potential(tvec=None, segments=None):
     """
     Records the membrane potential from all segments in all sections of the NEURON model.
 
+    Parameters:
+        tvec (h.Vector): Optional time vector to sample the membrane potential on.
+        segments (iterable): Optional subset of segments to record from (default: all segments of all sections).
+
     Returns:
         tuple:
             - v_segments (list): A list of segment objects where the membrane potential was recorded.
@@ -18,13 +49,17 @@ def record_membrane_potential():
     v = []
     v_segments = []
 
-    for sec in h.allsec():
-        for seg in sec.allseg():
-            v_segments.append(seg)
-            v.append(h.Vector().record(seg._ref_v))
+    if segments is None:
+        segments = (seg for sec in h.allsec() for seg in sec.allseg())
+    for seg in segments:
+        v_segments.append(seg)
+        v.append(record_reference(seg._ref_v, tvec, seg.sec))
     return v_segments, v
 
-def preprocess_membrane_potential_data(v_segments, v):
-    segments_array = np.array([str(seg) for seg in v_segments])
-    potential_array = np.array(v)
+def preprocess_membrane_potential_data(v_segments, v, n_samples=None, dtype=np.float64):
+    # v_segments are node ids (see `get_node_ids`)
+    if n_samples is None:
+        n_samples = len(v[0]) if v else 0
+    segments_array = np.asarray(v_segments, dtype=np.int64)
+    potential_array = stack_vectors(v, n_samples, dtype)
     return segments_array, potential_array
@@ -1,15 +1,20 @@
 import os
 import pandas as pd
 import numpy as np
-from neuron import h
 
+from model_simulation.recording_utils.record_membrane_potential import record_reference
+from model_simulation.recording_utils.convert_vectors import stack_vectors
 
-def measure_AMPA_current(model):
+
+def measure_AMPA_current(model, tvec=None, include=None):
     """
     Measures AMPA receptor-mediated synaptic currents.
 
     Parameters:
         model (object): The NEURON model containing a list of AMPA synapses (`AMPAlist`).
+        tvec (h.Vector): Optional time vector to sample the currents on.
+        include (callable): Optional predicate on the synapse segment; synapses for which it returns False are
+                            not recorded.
 
     Returns:
         tuple:
@@ -20,61 +25,112 @@ def measure_AMPA_current(model):
     AMPA_segments = []
 
     for syn in model.AMPAlist:
-        vec = h.Vector().record(syn._ref_i)
+        if include is not None and not include(syn.get_segment()):
+            continue
+        vec = record_reference(syn._ref_i, tvec, syn.get_segment().sec)
         AMPA.append(vec)
         AMPA_segments.append(syn.get_segment())
     return AMPA, AMPA_segments
 
 
-def measure_NMDA_current(model):
+def measure_NMDA_current(model, tvec=None, include=None):
     NMDA = []
     NMDA_segments = []
 
     for syn in model.NMDAlist:
-        vec = h.Vector().record(syn._ref_i)
+        if include is not None and not include(syn.get_segment()):
+            continue
+        vec = record_reference(syn._ref_i, tvec, syn.get_segment().sec)
         NMDA.append(vec)
         NMDA_segments.append(syn.get_segment())
     return NMDA, NMDA_segments
 
 
-def measure_GABA_current(model):
+def measure_GABA_current(model, tvec=None, include=None):
     GABA = []
     GABA_segments = []
 
     for syn in model.GABAlist:
-        vec = h.Vector().record(syn._ref_i)
+        if include is not None and not include(syn.get_segment()):
+            continue
+        vec = record_reference(syn._ref_i, tvec, syn.get_segment().sec)
         GABA.append(vec)
         GABA_segments.append(syn.get_segment())
     return GABA, GABA_segments
 
 
-def measure_GABA_B_current(model):
+def measure_GABA_B_current(model, tvec=None, include=None):
     GABA_B = []
     GABA_B_segments = []
 
     for syn in model.GABA_Blist:
-        vec = h.Vector().record(syn._ref_i)
+        if include is not None and not include(syn.get_segment()):
+            continue
+        vec = record_reference(syn._ref_i, tvec, syn.get_segment().sec)
         GABA_B.append(vec)
         GABA_B_segments.append(syn.get_segment())
     return GABA_B, GABA_B_segments
 
 
-def record_synaptic_currents(model):
+# Keys of the synaptic data and the corresponding synapse types of the model's synapse registry
+synapse_type_names = {'AMPA': 'AMPA', 'NMDA': 'NMDA', 'GABA': 'GABAfast', 'GABA_B': 'GABAslow'}
+
+
+def record_segment_synaptic_currents(model, tvec=None, include=None):
+    """
+    Records synaptic currents grouped by segment, using the model's synapse registry.
+
+    Synapses sharing a point process (see `SynapseRegistry`) are recorded with a single vector. `add_single_synapse`
+    and `add_synapses` use the shared point process by default, so a single vector is recorded per segment and
+    synapse type. Only synapses placed with `shared=False` have point processes of their own; their vectors are
+    adjacent to the others of the segment, so that they are summed into one row per segment and synapse type by
+    `preprocess_synaptic_data(..., aggregate=True)`.
+
+    Parameters:
+        model (object): The NEURON model with a synapse registry (`synapses`).
+        tvec (h.Vector): Optional time vector to sample the currents on.
+        include (callable): Optional predicate on the synapse segment selecting which synapses are recorded.
+
+    Returns:
+        tuple:
+            - synaptic_segments (dict): A dictionary where keys are synapse types and values are lists of segments.
+            - synaptic_currents (dict): A dictionary where keys are synapse types and values are lists of `h.Vector` objects.
+    """
+    synaptic_segments = {}
+    synaptic_currents = {}
+    for name, syn_type in synapse_type_names.items():
+        segments = []
+        currents = []
+        for synapses in model.synapses.by_segment(syn_type).values():
+            seg = synapses[0].get_segment()
+            if include is not None and not include(seg):
+                continue
+            for syn in synapses:
+                currents.append(record_reference(syn._ref_i, tvec, seg.sec))
+                segments.append(seg)
+        synaptic_segments[name] = segments
+        synaptic_currents[name] = currents
+    return synaptic_segments, synaptic_currents
+
+
+def record_synaptic_currents(model, tvec=None, include=None):
     """
     Records synaptic currents for all synapse types (AMPA, NMDA, GABA, GABA-B).
 
     Parameters:
         model (object): The NEURON model containing lists of synapses (`AMPAlist`, `NMDAlist`, `GABAlist`, `GABA_Blist`).
+        tvec (h.Vector): Optional time vector to sample the currents on.
+        include (callable): Optional predicate on the synapse segment selecting which synapses are recorded.
 
     Returns:
         tuple:
             - synaptic_segments (dict): A dictionary where keys are synapse types and values are lists of segments.
             - synaptic_currents (dict): A dictionary where keys are synapse types and values are lists of `h.Vector` objects.
     """
-    AMPA, AMPA_segments = measure_AMPA_current(model)
-    NMDA, NMDA_segments = measure_NMDA_current(model)
-    GABA, GABA_segments = measure_GABA_current(model)
-    GABA_B, GABA_B_segments = measure_GABA_B_current(model)
+    AMPA, AMPA_segments = measure_AMPA_current(model, tvec, include)
+    NMDA, NMDA_segments = measure_NMDA_current(model, tvec, include)
+    GABA, GABA_segments = measure_GABA_current(model, tvec, include)
+    GABA_B, GABA_B_segments = measure_GABA_B_current(model, tvec, include)
 
     synaptic_currents = {
         'AMPA': AMPA,
@@ -92,12 +148,21 @@ def record_synaptic_currents(model):
     return synaptic_segments, synaptic_currents
 
 
-def preprocess_synaptic_data(synaptic_segments, synaptic_currents):
+def preprocess_synaptic_data(synaptic_segments, synaptic_currents, n_samples=None, aggregate=False, dtype=np.float64):
+    # segments are node ids (see `get_node_ids`)
     segment_dict = {}
     current_dict = {}
     for synapse_type in synaptic_segments.keys():
-        segments_array = np.array(synaptic_segments[synapse_type]).astype('str')
-        currents_array = np.array(synaptic_currents[synapse_type])
+        currents = synaptic_currents[synapse_type]
+        segments_array = np.asarray(synaptic_segments[synapse_type], dtype=np.int64)
+        length = n_samples if n_samples is not None else (len(currents[0]) if len(currents) else 0)
+        currents_array = stack_vectors(currents, length, dtype)
+
+        if aggregate and len(segments_array) > 0:
+            # sum adjacent rows recorded from the same segment
+            starts = np.flatnonzero(np.r_[True, segments_array[1:] != segments_array[:-1]])
+            segments_array = segments_array[starts]
+            currents_array = np.add.reduceat(currents_array, starts, axis=0)
 
         segment_dict[synapse_type] = segments_array
         current_dict[synapse_type] = currents_array
@@ -0,0 +1,66 @@
+import os
+import hashlib
+import pandas as pd
+from neuron import h
+
+from model_simulation.recording_utils.extract_areas import get_segment_areas
+from model_simulation.recording_utils.extract_connections import build_connections, build_segment_table
+
+# In-memory cache: topology hash -> (connections, areas, segment table)
+_topology_cache = {}
+
+
+def topology_hash():
+    """
+    Computes a hash of the model topology and discretization.
+
+    The hash covers everything the connection table and the segment areas depend on: section names, parent
+    segments, number of segments, length, axial resistance and the diameter of every segment.
+
+    Returns:
+        str: A hexadecimal digest identifying the current topology.
+    """
+    hasher = hashlib.sha1()
+    for sec in h.allsec():
+        parent = sec.parentseg()
+        description = (sec.name(), None if parent is None else str(parent), sec.nseg, sec.L, sec.Ra,
+                       tuple(seg.diam for seg in sec))
+        hasher.update(repr(description).encode())
+    return hasher.hexdigest()
+
+
+def get_topology(cache_directory=None):
+    """
+    Returns the connection table, segment areas and segment table of the current model, extracting them only once
+    per topology.
+
+    Results are cached in memory, keyed on `topology_hash()`, and optionally pickled to `cache_directory` so that
+    other processes (e.g. sweep workers) can reuse them as well.
+
+    Parameters:
+        cache_directory (str): Optional directory for the on-disk cache.
+
+    Returns:
+        tuple:
+            - connections (pd.DataFrame): The connection table (see `build_connections`).
+            - areas (pd.DataFrame): The segment areas.
+            - segment_table (pd.DataFrame): The integer-coded nodes (see `build_segment_table`).
+    """
+    key = topology_hash()
+    if key not in _topology_cache:
+        cache_file = None if cache_directory is None else os.path.join(cache_directory, f'topology_tables_{key}.pkl')
+        if cache_file is not None and os.path.exists(cache_file):
+            tables = pd.read_pickle(cache_file)
+        else:
+            tables = (build_connections(), get_segment_areas(), build_segment_table())
+            if cache_file is not None:
+                os.makedirs(cache_directory, exist_ok=True)
+                pd.to_pickle(tables, cache_file)
+        _topology_cache[key] = tables
+
+    # return copies, so that callers cannot modify the cached tables
+    return tuple(table.copy() for table in _topology_cache[key])
+
+
+def clear_topology_cache():
+    _topology_cache.clear()
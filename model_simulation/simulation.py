@@ -1,66 +1,234 @@
+import os
 import numpy as np
 from neuron import h
 
-from model_simulation.recording_utils.record_membrane_potential import record_time_vector, record_membrane_potential, preprocess_membrane_potential_data
-from model_simulation.recording_utils.record_intrinsic import  record_intrinsic_currents, preprocess_intrinsic_data
-from model_simulation.recording_utils.record_synaptic import record_synaptic_currents, preprocess_synaptic_data
-from model_simulation.recording_utils.extract_areas import get_segment_areas
-from model_simulation.recording_utils.extract_connections import get_connections, get_external_connections, get_internal_connections
+from model_simulation.RecordingSpec import RecordingSpec
+from model_simulation.SimulationResult import SimulationResult
+from model_simulation.recording_utils.convert_vectors import collect_vectors
+from model_simulation.recording_utils.chunked_recording import get_recording_blocks, flush_chunk, merge_chunks
+from model_simulation.recording_utils.record_membrane_potential import record_reference, record_time_vector, record_membrane_potential
+from model_simulation.recording_utils.record_intrinsic import  record_intrinsic_currents
+from model_simulation.recording_utils.record_synaptic import record_synaptic_currents, record_segment_synaptic_currents
+from model_simulation.recording_utils.topology_cache import get_topology
+from model_simulation.recording_utils.extract_connections import get_node_offsets, get_node_ids
 
 
-def run_simulation(model, inj_site='soma', delay=100, duration=500, amplitude=0.1, tstop=1000):
+def run_simulation(model, inj_site='soma', delay=100, duration=500, amplitude=0.1, tstop=1000, record_times=None,
+                   recording_spec=None, chunk_duration=None, chunk_directory=None, topology_cache_dir=None,
+                   nthreads=None, warm_start=None, dtype=np.float64):
+    """
+    Runs a current clamp simulation on the model and records membrane potentials, intrinsic and synaptic currents.
+
+    Parameters:
+        model: The neuron model.
+        inj_site (str): The section where the current is injected (at its middle).
+        delay (float): Onset of the current injection (ms).
+        duration (float): Duration of the current injection (ms).
+        amplitude (float): Amplitude of the injected current (nA).
+        tstop (float): Duration of the simulation (ms).
+        record_times (array-like): Optional time grid (ms) to sample all variables on instead of recording every
+                                   variable step. Gives traces of the same length across runs.
+        recording_spec (RecordingSpec): Optional selection of the recorded variables, segments and time window.
+        chunk_duration (float): If given, the simulation advances in windows of this length (ms) and the recordings
+                                are flushed to `chunk_directory` after each window, so memory use does not grow with
+                                `tstop`. The returned arrays are memory-mapped from that directory.
+        chunk_directory (str): Directory for the flushed recordings (required with `chunk_duration`).
+        topology_cache_dir (str): Optional directory for persisting the connection table and segment areas. They are
+                                  always cached in memory and only extracted again when the topology changes.
+        nthreads (int): Optional number of threads to integrate on (uses `ParallelContext.nthread` together with
+                        cache-efficient mode). NEURON distributes whole cells (root trees) over the threads and does
+                        not split a cell, so this only speeds up models of several cells; a single-cell model (as
+                        all models of this package) runs on one thread. The previous thread settings are restored
+                        after the run, also if it fails.
+        warm_start (WarmStart): Optional snapshot of the state at the stimulus onset. The first run simulates up to
+                                the onset and saves the state; later runs restore it and only simulate the rest.
+                                All runs must have the same synaptic input (the snapshot holds the event queue).
+                                Recordings start at the onset. Not supported together with `record_times`.
+        dtype (np.dtype): The dtype the recorded currents are stored in (e.g. np.float32 to halve the memory used by
+                          the results and by every preprocessing stage). NEURON records in double precision; the
+                          values are converted when they are copied out of the recording vectors. The time axis and
+                          the membrane potentials are always float64: axial currents are computed from differences
+                          of a few microvolts between neighbouring segments, which float32 cannot resolve.
+
+    Returns:
+        SimulationResult: The recorded data together with the connection table and segment areas.
+    """
     # Set fixed time-step
     h.CVode().active(True)
     h.CVode().atol((1e-3))
 
-    # Get the section object from the model
-    section = getattr(model, inj_site, None)
-    if section is None:
-        raise ValueError(f"Invalid injection site: {inj_site}")
-
-    # Create a current clamp
-    stim = h.IClamp(section(0.5))  # Inject at the middle of the section
-    stim.delay = delay
-    stim.dur = duration
-    stim.amp = amplitude
-
-    # Record data
-    t = record_time_vector()
-    v_seg, v = record_membrane_potential()
-    intrinsic_seg, intrinsic_currents = record_intrinsic_currents()
-    synaptic_seg, synaptic_currents = record_synaptic_currents(model)
-
-    # Record injected current and add to intrinsic data
-    injected_current = h.Vector().record(stim._ref_i)
-    intrinsic_seg['injected_current'] = f'{inj_site}(0.5)'
-    intrinsic_currents['injected_current'] = injected_current  # -1 to follow convention
-
-    # Run the simulation
-    h.finitialize(-64.54)
-    h.continuerun(tstop)
-
-    # preprocess time axis
-    taxis = np.array(t)
-
-    # preprocess voltage data
-    v_segments, v_arrays = preprocess_membrane_potential_data(v_seg, v)
-    intrinsic_segments, intrinsic_arrays = preprocess_intrinsic_data(intrinsic_seg, intrinsic_currents)
-    synaptic_segments, synaptic_arrays = preprocess_synaptic_data(synaptic_seg, synaptic_currents)
-
-    simulation_data = {'membrane_potential_data': [v_segments, v_arrays],
-                       'intrinsic_data': [intrinsic_segments, intrinsic_arrays],
-                       'synaptic_data': [synaptic_segments, synaptic_arrays],
-                       'taxis': taxis}
-    connections = {'external': get_external_connections(), 'internal': get_internal_connections()}
-    simulation_data['connections'] = get_connections(connections['external'], connections['internal'])
-    simulation_data['areas'] = get_segment_areas()
+    if (chunk_duration is None) != (chunk_directory is None):
+        raise ValueError("chunk_duration and chunk_directory must be given together")
+    if chunk_duration is not None:
+        if chunk_duration <= 0:
+            raise ValueError(f"Invalid chunk duration: {chunk_duration}")
+        if record_times is not None:
+            # time-vector recordings index the time grid by the vector size, so they cannot be emptied mid-run
+            raise ValueError("Chunked simulation is not supported together with record_times")
+        os.makedirs(chunk_directory, exist_ok=True)
+    if warm_start is not None:
+        if record_times is not None:
+            # restoring a snapshot does not restore the position of time-vector recordings on their time grid
+            raise ValueError("Warm start is not supported together with record_times")
+        if delay < warm_start.t_onset:
+            raise ValueError(f"The current injection (delay={delay}) starts before the warm start onset "
+                             f"({warm_start.t_onset})")
+        first_event = model.synapses.first_event_time()
+        if first_event is not None and first_event < warm_start.t_onset:
+            raise ValueError(f"Synaptic events (from {first_event} ms) start before the warm start onset "
+                             f"({warm_start.t_onset})")
+        if warm_start.t_onset >= tstop:
+            raise ValueError(f"The warm start onset ({warm_start.t_onset}) must be before tstop={tstop}")
+
+    # Resolve what to record (default: every variable of every segment for the whole run)
+    if recording_spec is None:
+        recording_spec = RecordingSpec()
+    t_start, t_stop = recording_spec.window(tstop)
+    segments = None if recording_spec.selects_all_segments() else list(recording_spec.iter_segments())
+
+    # Set up the uniform recording grid (CVode still does the integration, variables are sampled at these times)
+    tvec = None
+    if record_times is not None:
+        record_times = np.asarray(record_times, dtype=float)
+        if record_times.ndim != 1 or record_times.size == 0 or np.any(np.diff(record_times) <= 0):
+            raise ValueError("record_times must be a non-empty, strictly increasing 1D array")
+        if record_times[0] < 0 or record_times[-1] > tstop:
+            raise ValueError(f"record_times must lie within [0, tstop={tstop}]")
+        record_times = record_times[(record_times >= t_start) & (record_times <= t_stop)]
+        if record_times.size == 0:
+            raise ValueError(f"No record_times fall into the recording window [{t_start}, {t_stop}]")
+        tvec = h.Vector(record_times)
+
+    # Set up multithreaded integration
+    pc = h.ParallelContext()
+    previous_nthreads = int(pc.nthread())
+    previous_cache_efficient = int(h.CVode().cache_efficient())
+    if nthreads is not None:
+        if nthreads < 1:
+            raise ValueError(f"Invalid number of threads: {nthreads}")
+        pc.nthread(nthreads)
+        h.CVode().cache_efficient(True)
+
+    try:
+        # Get the section object from the model
+        section = getattr(model, inj_site, None)
+        if section is None:
+            raise ValueError(f"Invalid injection site: {inj_site}")
+
+        # Create a current clamp
+        stim = h.IClamp(section(0.5))  # Inject at the middle of the section
+        stim.delay = delay
+        stim.dur = duration
+        stim.amp = amplitude
+
+        # Record data
+        t = record_time_vector(tvec)
+        if recording_spec.record_voltage:
+            v_seg, v = record_membrane_potential(tvec, segments)
+        else:
+            v_seg, v = [], []
+        intrinsic_seg, intrinsic_currents = record_intrinsic_currents(tvec, segments,
+                                                                      recording_spec.selected_current_types())
+        if recording_spec.record_synaptic:
+            if recording_spec.aggregate_synapses:
+                synaptic_seg, synaptic_currents = record_segment_synaptic_currents(model, tvec, recording_spec.includes)
+            else:
+                synaptic_seg, synaptic_currents = record_synaptic_currents(model, tvec, recording_spec.includes)
+        else:
+            synaptic_seg, synaptic_currents = {}, {}
+
+        # Record injected current and add to intrinsic data
+        injected_current = record_reference(stim._ref_i, tvec, section)
+        intrinsic_seg['injected_current'] = section(0.5)
+        intrinsic_currents['injected_current'] = injected_current  # -1 to follow convention
+
+        # Run the simulation
+        if warm_start is None:
+            h.finitialize(-64.54)
+        else:
+            # restore (or create) the state at the stimulus onset and start recording from there
+            warm_start.initialize(-64.54, model)
+            h.frecord_init()
+        if t_start > h.t:
+            h.continuerun(t_start)
+            if tvec is None:
+                # discard the variable-step samples recorded before the window
+                for vec in collect_vectors(t, v, intrinsic_currents, synaptic_currents):
+                    vec.resize(0)
+        t_start = max(t_start, h.t)
+        if chunk_duration is None:
+            h.continuerun(t_stop)
+        else:
+            # Advance window by window, flushing the recordings to disk to keep memory bounded
+            blocks = get_recording_blocks(t, v, intrinsic_currents, synaptic_currents)
+            boundaries = np.append(np.arange(t_start + chunk_duration, t_stop, chunk_duration), t_stop)
+            for chunk_index, t_next in enumerate(boundaries):
+                h.continuerun(t_next)
+                flush_chunk(chunk_directory, chunk_index, blocks, dtype)
+            arrays = merge_chunks(chunk_directory, blocks.keys(), len(boundaries))
+            t = arrays['taxis']
+            v = arrays['membrane_potential']
+            intrinsic_currents = {current_type: arrays[f'intrinsic_{current_type}']
+                                  for current_type in intrinsic_currents}
+            synaptic_currents = {synapse_type: arrays[f'synaptic_{synapse_type}'] for synapse_type in synaptic_currents}
+    finally:
+        # restore the global thread settings, also if the run fails
+        if nthreads is not None:
+            pc.nthread(previous_nthreads)
+            h.CVode().cache_efficient(previous_cache_efficient)
+
+    # Identify the recorded segments by their node ids (names are only produced for the output)
+    node_offsets = get_node_offsets()
+    v_seg = get_node_ids(v_seg, node_offsets)
+    intrinsic_seg = {current_type: get_node_ids(segments, node_offsets) if isinstance(segments, list)
+                     else get_node_ids([segments], node_offsets)[0]
+                     for current_type, segments in intrinsic_seg.items()}
+    synaptic_seg = {synapse_type: get_node_ids(segments, node_offsets)
+                    for synapse_type, segments in synaptic_seg.items()}
+
+    # Wrap the recordings; they are converted to arrays only when accessed
+    connections, areas, segment_table = get_topology(topology_cache_dir)
+    simulation_data = SimulationResult(t, v_seg, v, intrinsic_seg, intrinsic_currents, synaptic_seg, synaptic_currents,
+                                       connections=connections, areas=areas, segment_table=segment_table,
+                                       aggregate_synapses=recording_spec.aggregate_synapses, dtype=dtype)
     return simulation_data
 
 
-def add_single_synapse(model, target_section, syn_type, event_time, loc=0.5, weight=0.001):
+# Synapse types: (point process, tau1 (ms), tau2 (ms), reversal potential (mV))
+synapse_parameters = {
+    'AMPA': ('Exp2Syn', 0.1, 1, 0),
+    'NMDA': ('Exp2SynNMDA', 2, 50, 0),
+    'GABAfast': ('Exp2Syn', 0.1, 4, -65),
+    'GABAslow': ('Exp2Syn', 1, 40, -80)
+}
+
+
+def create_synapse(section, syn_type, loc):
+    """
+    Creates a synapse point process of the given type and sets its time constants and reversal potential.
+
+    Parameters:
+        section (h.Section): The section where the synapse is placed.
+        syn_type (str): Synapse type ('AMPA', 'NMDA', 'GABAfast', 'GABAslow').
+        loc (float): Location along the section (0-1).
+
+    Returns:
+        syn: The created synapse object.
+    """
+    mechanism, tau1, tau2, e = synapse_parameters[syn_type]
+    syn = getattr(h, mechanism)(loc, sec=section)
+    syn.tau1, syn.tau2 = tau1, tau2
+    syn.e = e
+    return syn
+
+
+def add_single_synapse(model, target_section, syn_type, event_time, loc=0.5, weight=0.001, shared=True):
     """
     Adds a single synapse (AMPA, NMDA, GABAfast, GABAslow) to a given section at a specific time.
 
+    By default the synapse uses the shared point process of its segment and type (see `SynapseRegistry`), like
+    `add_synapses`, so synapses on the same segment are recorded with one vector per synapse type.
+
     Parameters:
         model: The neuron model.
         target_section (str): The section where the synapse is applied (e.g., 'soma', 'dend1').
@@ -68,41 +236,25 @@ def add_single_synapse(model, target_section, syn_type, event_time, loc=0.5, wei
         event_time (float): The time (ms) at which the synapse is activated.
         loc (float): Location along the section (0-1, default is 0.5).
         weight (float): Synaptic weight (default: 0.001).
+        shared (bool): Whether the synapse shares one point process with the synapses of the same type on the
+                       segment (False creates a separate point process, recorded separately).
 
     Returns:
-        syn: The created synapse object.
+        syn: The synapse object driven by the synapse's NetCon.
     """
     # Get the target section
     section = getattr(model, target_section, None)
     if section is None:
         raise ValueError(f"Invalid target section: {target_section}")
 
-    # Create the appropriate synapse
-    synapse_map = {
-        'AMPA': h.Exp2Syn(loc, sec=section),
-        'NMDA': h.Exp2SynNMDA(loc, sec=section),
-        'GABAfast': h.Exp2Syn(loc, sec=section),
-        'GABAslow': h.Exp2Syn(loc, sec=section)
-    }
-
-    if syn_type not in synapse_map:
+    # Create the appropriate synapse (only the requested point process is instantiated)
+    if syn_type not in synapse_parameters:
         raise ValueError(f"Invalid synapse type: {syn_type}")
 
-    syn = synapse_map[syn_type]
-
-    # Set time constants and gmax
-    if syn_type in ['AMPA']:
-        syn.tau1, syn.tau2 = 0.1, 1
-        syn.e = 0
-    elif syn_type in ['NMDA']:
-        syn.tau1, syn.tau2 = 2, 50
-        syn.e = 0
-    elif syn_type in ['GABAfast']:
-        syn.tau1, syn.tau2 = 0.1, 4
-        syn.e = -65
-    elif syn_type in ['GABAslow']:
-        syn.tau1, syn.tau2 = 1, 40
-        syn.e = -80
+    syn = model.synapses.get_shared(syn_type, section(loc)) if shared else None
+    if syn is None:
+        syn = create_synapse(section, syn_type, loc)
+        model.synapses.register(syn_type, syn, shared=shared)
 
     # Create NetStim (spike generator)
     stim = h.NetStim()
@@ -116,6 +268,112 @@ def add_single_synapse(model, target_section, syn_type, event_time, loc=0.5, wei
     nc.threshold = 0
     nc.weight[0] = weight
 
-    model.add_synapse_ref(syn, stim, nc)  # Store references in model to prevent GC
+    model.synapses.keep(stim, nc)  # Store references in model to prevent GC
+    model.synapses.add_event_times([event_time])
+    model.synapses.add_placement(('add_single_synapse', target_section, syn_type, event_time, loc, weight, shared))
     if weight != 0:
         print(f"Synapse added at loc {loc} on {target_section}, type {syn_type}, weight {weight}")
+    return syn
+
+
+def add_synapses(model, target_sections, syn_types, locs, weights, spike_times, sources=None, shared=True):
+    """
+    Adds many synapses at once, driven by a set of (possibly shared) spike trains.
+
+    Every spike train is played by a single `VecStim` source, and every synapse gets a NetCon from the VecStim of
+    its train, so no spike generator is created per synapse and any number of synapses can share one spike train.
+    Events are delivered at the given spike times (the NetCons have no delay).
+
+    By default, synapses of the same type on the same segment share one point process in the model's synapse
+    registry (see `SynapseRegistry`), so the number of point processes (and recorded vectors) grows with the number
+    of segments rather than the number of synapses.
+
+    Parameters:
+        model: The neuron model.
+        target_sections (array-like): Section names, one per synapse (or a single name for all synapses).
+        syn_types (array-like): Synapse types ('AMPA', 'NMDA', 'GABAfast', 'GABAslow'), one per synapse (or one for all).
+        locs (array-like): Locations along the sections (0-1), one per synapse (or one for all).
+        weights (array-like): Synaptic weights, one per synapse (or one for all).
+        spike_times (list): A list of 1D arrays of spike times (ms), one per source (e.g. from `poisson_spike_trains`).
+                            The trains are sorted; times must be finite and non-negative.
+        sources (array-like): Index of the spike train driving each synapse (default: synapse i is driven by train i).
+        shared (bool): Whether synapses of the same type on the same segment share one point process.
+
+    Returns:
+        list: The synapse object driven by each synapse's NetCon.
+    """
+    if sources is None:
+        sources = np.arange(len(spike_times))
+    target_sections, syn_types, locs, weights, sources = np.broadcast_arrays(
+        np.asarray(target_sections), np.asarray(syn_types), np.asarray(locs, dtype=float),
+        np.asarray(weights, dtype=float), np.asarray(sources, dtype=int))
+    if target_sections.ndim != 1:
+        raise ValueError("Synapse parameters must be scalars or 1D arrays")
+    if sources.size and (sources.min() < 0 or sources.max() >= len(spike_times)):
+        raise ValueError(f"Synapse sources must index the {len(spike_times)} spike trains")
+    invalid_types = set(np.unique(syn_types)) - set(synapse_parameters)
+    if invalid_types:
+        raise ValueError(f"Invalid synapse types: {sorted(invalid_types)}")
+
+    sections = {}
+    for name in np.unique(target_sections):
+        section = getattr(model, name, None)
+        if section is None:
+            raise ValueError(f"Invalid target section: {name}")
+        sections[name] = section
+
+    # VecStim needs non-decreasing, finite, non-negative spike times
+    spike_times = [np.sort(np.asarray(times, dtype=float).ravel()) for times in spike_times]
+    for source, times in enumerate(spike_times):
+        if not np.isfinite(times).all() or (times.size and times[0] < 0):
+            raise ValueError(f"Spike train {source} must contain finite, non-negative spike times")
+
+    # One VecStim per spike train that drives at least one synapse
+    vecstims = {}
+    for source in np.unique(sources):
+        spike_vector = h.Vector(spike_times[source])
+        vecstim = h.VecStim()
+        vecstim.play(spike_vector)
+        vecstims[source] = vecstim
+        model.synapses.keep(vecstim, spike_vector)
+
+    created = []
+    for name, syn_type, loc, weight, source in zip(target_sections, syn_types, locs, weights, sources):
+        section = sections[name]
+        syn = model.synapses.get_shared(syn_type, section(loc)) if shared else None
+        if syn is None:
+            syn = create_synapse(section, syn_type, loc)
+            model.synapses.register(syn_type, syn, shared=shared)
+        nc = h.NetCon(vecstims[source], syn)
+        nc.delay = 0
+        nc.weight[0] = weight
+        model.synapses.keep(nc)
+        created.append(syn)
+
+    model.synapses.add_placement(('add_synapses', target_sections, syn_types, locs, weights, sources, spike_times))
+    driven_spike_times = [spike_times[source] for source in vecstims]
+    if driven_spike_times:
+        model.synapses.add_event_times(np.concatenate(driven_spike_times))
+    return created
+
+
+def poisson_spike_trains(rate, tstop, n_trains, t_start=0, seed=None):
+    """
+    Generates independent homogeneous Poisson spike trains.
+
+    Parameters:
+        rate (float): Firing rate (Hz).
+        tstop (float): End of the spike trains (ms).
+        n_trains (int): Number of spike trains.
+        t_start (float): Start of the spike trains (ms).
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        list: A list of `n_trains` sorted 1D arrays of spike times (ms).
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(rate * (tstop - t_start) / 1000, size=n_trains)
+    times = rng.uniform(t_start, tstop, size=counts.sum())
+    trains = np.repeat(np.arange(n_trains), counts)
+    order = np.lexsort((times, trains))
+    return np.split(times[order], np.cumsum(counts)[:-1])
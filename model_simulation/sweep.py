@@ -0,0 +1,101 @@
+import itertools
+import multiprocessing as mp
+from functools import partial
+
+from model_simulation.SimpleModel import SimpleModel
+from model_simulation.simulation import run_simulation, add_single_synapse
+
+# Keyword arguments of run_simulation that can be varied in a sweep
+simulation_parameters = ('inj_site', 'delay', 'duration', 'amplitude', 'tstop', 'record_times',
+                         'recording_spec', 'topology_cache_dir', 'nthreads', 'warm_start', 'dtype')
+
+
+def expand_parameter_grid(param_grid):
+    """
+    Expands a parameter grid into a list of per-run parameter dictionaries.
+
+    Parameters:
+        param_grid (dict or list): Either a dictionary mapping parameter names to lists of values, in which case the
+                                   cartesian product is taken (the last key varies fastest), or an explicit list of
+                                   parameter dictionaries.
+
+    Returns:
+        list: A list of parameter dictionaries, one per run, in a deterministic order.
+
+    Valid parameter names are the keyword arguments of `run_simulation` listed in `simulation_parameters` and
+    'synapses', a list of keyword argument dictionaries for `add_single_synapse`
+    (e.g. {'target_section': 'soma', 'syn_type': 'NMDA', 'event_time': 20, 'weight': 0.001}).
+    """
+    if isinstance(param_grid, dict):
+        keys = list(param_grid.keys())
+        runs = [dict(zip(keys, values)) for values in itertools.product(*(param_grid[key] for key in keys))]
+    else:
+        runs = [dict(params) for params in param_grid]
+
+    for params in runs:
+        unknown = set(params) - set(simulation_parameters) - {'synapses'}
+        if unknown:
+            raise ValueError(f"Invalid sweep parameters: {sorted(unknown)}")
+    return runs
+
+
+def run_single(params, model_class=SimpleModel):
+    """
+    Builds a fresh model, adds the requested synapses and runs a single simulation.
+
+    Parameters:
+        params (dict): Parameters of the run (see `expand_parameter_grid`).
+        model_class (type): The model class to instantiate (default: SimpleModel).
+
+    Returns:
+        SimulationResult: The simulation data returned by `run_simulation`.
+    """
+    model = model_class()
+    for synapse in params.get('synapses', []):
+        add_single_synapse(model, **synapse)
+    simulation_kwargs = {key: value for key, value in params.items() if key in simulation_parameters}
+    return run_simulation(model, **simulation_kwargs)
+
+
+def iter_sweep(param_grid, processes=None, model_class=SimpleModel):
+    """
+    Runs a parameter sweep on a process pool and yields the results as they become available.
+
+    Every run is executed in a new worker process (spawned, and replaced after each task), so each simulation
+    starts from a clean NEURON state: sections created by earlier models never leak into `h.allsec()`.
+    Results are yielded in the order of the expanded parameter grid, regardless of which worker finishes first.
+
+    Note: as with any spawned process pool, the calling script must be protected by
+    `if __name__ == '__main__':`.
+
+    Parameters:
+        param_grid (dict or list): The parameter grid (see `expand_parameter_grid`).
+        processes (int): Number of worker processes (default: number of CPU cores).
+        model_class (type): The model class instantiated in each worker (default: SimpleModel).
+
+    Yields:
+        tuple:
+            - params (dict): The parameters of the run.
+            - simulation_data (SimulationResult): The simulation data returned by `run_simulation`.
+    """
+    runs = expand_parameter_grid(param_grid)
+    context = mp.get_context('spawn')
+    with context.Pool(processes=processes, maxtasksperchild=1) as pool:
+        results = pool.imap(partial(run_single, model_class=model_class), runs, chunksize=1)
+        for params, simulation_data in zip(runs, results):
+            yield params, simulation_data
+
+
+def run_sweep(param_grid, processes=None, model_class=SimpleModel):
+    """
+    Runs a parameter sweep on a process pool and returns all results.
+
+    Parameters:
+        param_grid (dict or list): The parameter grid (see `expand_parameter_grid`).
+        processes (int): Number of worker processes (default: number of CPU cores).
+        model_class (type): The model class instantiated in each worker (default: SimpleModel).
+
+    Returns:
+        list: A list of (params, simulation_data) tuples in the order of the expanded parameter grid.
+    """
+    return list(iter_sweep(param_grid, processes=processes, model_class=model_class))
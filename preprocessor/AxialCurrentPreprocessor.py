@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
 
-from preprocessor.utils.preprocess_axial import get_segment_iax, update_root_node
+from preprocessor.SegmentAggregator import SegmentAggregator
+from preprocessor.SegmentTable import SegmentTable
+from preprocessor.utils.preprocess_axial import update_root_node
 
 
 class AxialCurrentPreprocessor:
@@ -15,62 +17,83 @@ class AxialCurrentPreprocessor:
     def __init__(self) -> None:
         self.axial_current = pd.DataFrame
         self.axial_current_soma_merged = pd.DataFrame
+        self.segment_table = None
+        self.ref_ids = np.array([], dtype=np.int64)
+        self.par_ids = np.array([], dtype=np.int64)
+        self.axial_values = np.empty((0, 0))
 
-    def calculate_axial_currents(self, simulation_data: dict) -> None:
+    def calculate_axial_currents(self, simulation_data: dict, dtype=np.float64,
+                                 segment_table: SegmentTable = None) -> None:
         """
         Calculates axial currents based on simulation data.
 
+        Connections are handled by the integer node ids of their segments (see `SegmentTable`): the 'ref_id' and
+        'par_id' columns of the connection table if present, otherwise the ids of the segment names.
+
         Args:
             simulation_data (dict): A dictionary containing connection data and membrane potential data.
                 - 'connections': A DataFrame with 'ref', 'par', and 'ri_par' columns.
-                - 'membrane_potential_data': A tuple containing segments and membrane potential values.
+                - 'membrane_potential_data': A tuple containing segment ids and membrane potential values.
+            dtype (np.dtype): The dtype of the axial currents (they are calculated in float64 and then cast).
+            segment_table (SegmentTable): Optional prebuilt segment table of the simulation, e.g. shared by the time
+                                          windows of one simulation (default: built from the simulation data).
 
-        Populates the 'axial_current' attribute with a MultiIndex DataFrame of calculated currents.
+        Populates the 'axial_current' attribute with a MultiIndex DataFrame of calculated currents, and 'ref_ids',
+        'par_ids' and 'axial_values' with the same data by node id.
         """
         connections = simulation_data['connections']
         segments = simulation_data['membrane_potential_data'][0]
-        membrane_potential = simulation_data['membrane_potential_data'][1]
-
-        df_v = pd.DataFrame(data=membrane_potential)
-        df_v.insert(0, 'segment', segments)
-
-        # Calculate axial currents
-        iax = np.empty((connections.shape[0], df_v.shape[1] - 1))
-        for i, _ in enumerate(connections.iloc[:, 0]):
-            try:
-                ref = connections.iloc[i, 0]
-                par = connections.iloc[i, 1]
-                ri_par = connections.iloc[i, 2]
-
-                v_ref = df_v[df_v['segment'] == ref].iloc[0, 1:].values
-                v_par = df_v[df_v['segment'] == par].iloc[0, 1:].values
-
-                iax_row = (v_par - v_ref) / ri_par
-            except IndexError:
-                # print(f"The following segment does not have a parent: {connections.iloc[i, 0]}")  # sanity check
-                iax_row = np.zeros(df_v.shape[1] - 1)
-            iax[i, :] = iax_row
-        axial_values = iax
-        axial_index = pd.DataFrame(data={'ref': connections['ref'].values, 'par': connections['par'].values})
-
-        # Create a DataFrame with a MultiIndex
-        multiindex = pd.MultiIndex.from_frame(axial_index)
-        self.axial_current = pd.DataFrame(data=axial_values, index=multiindex)
+        membrane_potential = np.asarray(simulation_data['membrane_potential_data'][1])
+        if segment_table is None:
+            segment_table = SegmentTable.from_simulation_data(simulation_data)
+
+        if 'ref_id' in connections and 'par_id' in connections:
+            ref_ids = connections['ref_id'].to_numpy(dtype=np.int64)
+            par_ids = connections['par_id'].to_numpy(dtype=np.int64)
+        else:
+            ref_ids = segment_table.ids(connections['ref'].values)
+            par_ids = segment_table.ids(connections['par'].values)
+        ri = connections.iloc[:, 2].to_numpy(dtype=np.float64)
+
+        # Map node ids to rows of the membrane potential array (first occurrence, -1 if not recorded)
+        v_ids = segment_table.to_ids(segments)
+        recorded = np.flatnonzero(v_ids >= 0)[::-1]
+        positions = np.full(len(segment_table), -1)
+        positions[v_ids[recorded]] = recorded
+        ref_idx = np.where(ref_ids >= 0, positions[ref_ids], -1)
+        par_idx = np.where(par_ids >= 0, positions[par_ids], -1)
+
+        # Calculate all axial currents at once; connections with a missing segment (e.g. the root) are zero.
+        # Potential differences are taken in float64 (they are often below the float32 resolution at -65 mV), and
+        # only the resulting currents are cast to dtype.
+        valid = (ref_idx >= 0) & (par_idx >= 0)
+        iax = np.zeros((connections.shape[0], membrane_potential.shape[1]), dtype=dtype)
+        v_par = membrane_potential[par_idx[valid]].astype(np.float64, copy=False)
+        v_ref = membrane_potential[ref_idx[valid]].astype(np.float64, copy=False)
+        iax[valid] = (v_par - v_ref) / ri[valid, None]
+
+        self.segment_table = segment_table
+        self.ref_ids = ref_ids
+        self.par_ids = par_ids
+        self.axial_values = iax
+
+        # Create a DataFrame with a MultiIndex (segment names are only looked up for the output)
+        multiindex = pd.MultiIndex.from_arrays([segment_table.names(ref_ids), segment_table.names(par_ids)],
+                                               names=['ref', 'par'])
+        self.axial_current = pd.DataFrame(data=iax, index=multiindex, copy=False)
 
     def merge_section_iax(self, target: str) -> pd.DataFrame:
         """
-        Merges axial currents for a specified target section ('soma' or 'dendrite').
+        Merges axial currents for a specified target section ('soma' or another section, e.g. a dendrite).
 
         Args:
-            target (str): The target section to merge ('soma' or a specific 'dend' name).
+            target (str): The target section to merge ('soma' or a specific section name).
 
         Returns:
             pd.DataFrame: The merged axial current DataFrame.
         """
-        if target.startswith('soma'):
+        if target == 'soma':
             return self.merge_soma_iax()
-        elif target.startswith('dend'):
-            self.merge_soma_iax()
         return self.merge_dendrite_iax(target)
 
     def merge_soma_iax(self) -> pd.DataFrame:
@@ -80,75 +103,33 @@ class AxialCurrentPreprocessor:
         Returns:
             pd.DataFrame: The merged axial current DataFrame with soma connections.
         """
-        df = self.axial_current
-
-        # Get axial currents for specific soma segments
-        # df_iax_soma_1 = get_segment_iax('soma(0.166667)', df)
-        df_iax_soma_2 = get_segment_iax('soma(0.5)', df)
-        # df_iax_soma_3 = get_segment_iax('soma(0.833333)', df)
-        df_iax_soma_4 = get_segment_iax('soma(1)', df)
-
-        # Soma-dendrite axial currents
-        iax_dend1 = df_iax_soma_4.loc[[("dend1(0.5)", "soma(1)")]]
-
-        # Merge soma axial currents
-        df_iax_soma_merged = iax_dend1
-
-        # Update parent labels to 'soma'
-        index_tuples = df_iax_soma_merged.index.tolist()
-        new_index_tuples = [(ref, 'soma') for ref, par in index_tuples]
-        new_index = pd.MultiIndex.from_tuples(new_index_tuples, names=df_iax_soma_merged.index.names)
-        df_iax_soma_merged.index = new_index
-
-        # Remove internal axial current rows (with "soma" in "ref")
-        ref_idx = df[df.index.get_level_values("ref").str.contains("soma")].index
-        df_iax_ref_removed = df.drop(ref_idx)
-
-        # Remove original soma-dendrite axial currents (with "soma" in "par")
-        par_idx = df_iax_ref_removed[df_iax_ref_removed.index.get_level_values("par").str.contains("soma")].index
-        df_iax_removed = df_iax_ref_removed.drop(par_idx)
-
-        # Combine updated segments
-        self.axial_current_soma_merged = pd.concat([df_iax_removed, df_iax_soma_merged], axis=0)
+        self.axial_current_soma_merged = self.merge_groups(SegmentAggregator.from_sections(['soma']))
         return self.axial_current_soma_merged
 
     def merge_dendrite_iax(self, target: str) -> pd.DataFrame:
         """
         Merges dendrite-related axial currents for a specified target dendrite section.
 
+        Both the soma and the target section are merged into single nodes, and the tree is re-rooted at the target.
+
         Args:
             target (str): The target dendrite section to merge.
 
         Returns:
             pd.DataFrame: The updated axial current DataFrame for the specified dendrite section (with updated root node).
         """
-
-        df = self.axial_current_soma_merged
-        # Select external iax connections (between parent and children nodes)
-        df_segment_ref = df[df.index.get_level_values('ref').str.startswith(
-            f'{target}(')]  # select iax rows where segment is the reference
-        df_segment_par = df[df.index.get_level_values('par').str.startswith(
-            f'{target}(')]  # select iax rows where segment is the parent
-        # this is now a new copy - so renaming does not affects the original dataframe
-        df_external = pd.concat([df_segment_ref, df_segment_par]).drop_duplicates(
-            keep=False)  # this keeps rows that are unique (meaning that they connect to external nodes)
-
-        # Rename index
-        iref = df.index.get_level_values('ref').str.startswith(f'{target}(')
-        first_internal_name = df.index.get_level_values('ref')[iref].sort_values()[
-            0]  # we assume that sorting will sort it correctly: The first element is the first internal node
-        last_terminal_name = df.index.get_level_values('ref')[iref].sort_values()[
-            -1]  # and the last is the terminal node
-        rename_dict = {first_internal_name: target,
-                       last_terminal_name: target}
-        df_external.rename(index=rename_dict, level='ref', inplace=True)
-        df_external.rename(index=rename_dict, level='par', inplace=True)
-
-        # Remove segment iax rows (both external and internal)
-        df_internal_idx = pd.concat([df_segment_ref, df_segment_par]).drop_duplicates().index
-        df.drop(df_internal_idx, inplace=True)
-
-        # Concatenate updated external iax rows
-        df_merged = pd.concat([df, df_external])
+        df_merged = self.merge_groups(SegmentAggregator.from_sections(['soma', target]))
         df_updated_root = update_root_node(df_merged, target)
         return df_updated_root
+
+    def merge_groups(self, aggregator: SegmentAggregator) -> pd.DataFrame:
+        """
+        Merges axial currents of arbitrary segment groups with one sparse matrix product.
+
+        Args:
+            aggregator (SegmentAggregator): The segment grouping (can be reused across simulations).
+
+        Returns:
+            pd.DataFrame: The axial currents between the merged nodes, indexed by ('ref', 'par').
+        """
+        return aggregator.merge_iax_ids(self.ref_ids, self.par_ids, self.axial_values, self.segment_table)
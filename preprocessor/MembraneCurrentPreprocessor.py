@@ -1,8 +1,8 @@
+import numpy as np
 import pandas as pd
-import gc
 
-from preprocessor.utils.preprocess_intrinsic import preprocess_intrinsic
-from preprocessor.utils.preprocess_synaptic import preprocess_synaptic
+from preprocessor.SegmentAggregator import SegmentAggregator
+from preprocessor.SegmentTable import SegmentTable
 
 
 class MembraneCurrentPreprocessor:
@@ -15,69 +15,138 @@ class MembraneCurrentPreprocessor:
 
         Args:
             membrane_currents_combined (pd.DataFrame): A DataFrame containing combined membrane currents.
+            membrane_currents_tensor (np.ndarray): The combined membrane currents as a (segment x itype x time) array.
+            segment_ids (np.ndarray): Node ids (see `SegmentTable`) along the first axis of the tensor.
+            segment_table (SegmentTable): The segment table the ids refer to.
+            itypes (np.ndarray): Current types along the second axis of the tensor.
         """
         self.membrane_currents_combined = pd.DataFrame()
-
-    def combine_membrane_currents(self, simulation_data: dict) -> None:
+        self.membrane_currents_tensor = np.empty((0, 0, 0))
+        self.segment_ids = np.array([], dtype=np.int64)
+        self.segment_table = None
+        self.itypes = np.array([], dtype=str)
+
+    @property
+    def segments(self) -> np.ndarray:
+        """Segment names along the first axis of the tensor."""
+        if self.segment_table is None:
+            return np.array([], dtype=object)
+        return self.segment_table.names(self.segment_ids)
+
+    def combine_membrane_currents(self, simulation_data: dict, dtype=np.float64, segment_table: SegmentTable = None,
+                                  node_areas: np.ndarray = None) -> None:
         """
         Combines intrinsic and synaptic currents into a single DataFrame.
 
-        This method preprocesses intrinsic and synaptic currents using utility functions,
-        concatenates the resulting DataFrames, and sets the processed data to the
-        'membrane_currents_combined' attribute.
+        The currents are written into one preallocated tensor (see `build_membrane_current_tensor`), and
+        'membrane_currents_combined' is set to a DataFrame view of it with a ('segment', 'itype') MultiIndex
+        covering every combination of segment and current type (missing combinations are zero).
 
         Args:
             simulation_data (dict): The simulation data containing 'intrinsic_data', 'synaptic_data',
                                     and 'areas' used for preprocessing.
+            dtype (np.dtype): The dtype of the combined currents.
+            segment_table (SegmentTable): Optional prebuilt segment table of the simulation (see
+                                          `build_membrane_current_tensor`).
+            node_areas (np.ndarray): Optional prebuilt segment areas by node id.
 
         Example of expected simulation_data structure:
             simulation_data = {
-                'intrinsic_data': ([segments], [values]),
-                'synaptic_data': ([segments], [values]),
+                'intrinsic_data': ([segment ids], [values]),
+                'synaptic_data': ([segment ids], [values]),
                 'areas': [area_values]
             }
         """
-        isegments = simulation_data['intrinsic_data'][0]
-        ivalues = simulation_data['intrinsic_data'][1]
-        area = simulation_data['areas']
-        ssegments = simulation_data['synaptic_data'][0]
-        svalues = simulation_data['synaptic_data'][1]
-
-        intrinsic = preprocess_intrinsic(isegments, ivalues, area)
-        synaptic = preprocess_synaptic(ssegments, svalues)
-
-        # Create merged dataframe
-        dfs = intrinsic + synaptic
-        del intrinsic, synaptic
-        gc.collect()
+        self.build_membrane_current_tensor(simulation_data, dtype, segment_table, node_areas)
+        self.membrane_currents_combined = self.tensor_frame()
 
-        df_im = pd.concat(dfs)
-        del dfs
-        gc.collect()
-
-        df_im['index'] = df_im['index'].astype('category')
-        df_im['itype'] = df_im['itype'].astype('category')
+    def build_membrane_current_tensor(self, simulation_data: dict, dtype=np.float64,
+                                      segment_table: SegmentTable = None, node_areas: np.ndarray = None) -> np.ndarray:
+        """
+        Writes intrinsic and synaptic currents directly into a dense (segment x itype x time) tensor.
 
-        # Calculate and set multiindex
-        segments = df_im['index'].unique()
-        itypes = df_im['itype'].unique()
+        Segments are identified by their node ids (see `SegmentTable`). Segments and current types are ordered by
+        first appearance (intrinsic currents first, synaptic segments ordered by id within a type). Intrinsic
+        currents are converted to nA, the injected current is negated to follow the membrane current convention,
+        and synaptic currents are summed per segment.
 
-        multi_index = pd.MultiIndex.from_product([segments, itypes], names=['segment', 'itype'])
-        df_im_combined = df_im.set_index(['index', 'itype']).reindex(multi_index)
-        del df_im
-        gc.collect()
+        Args:
+            simulation_data (dict): The simulation data containing 'intrinsic_data', 'synaptic_data' and 'areas'.
+            dtype (np.dtype): The dtype of the tensor.
+            segment_table (SegmentTable): Optional prebuilt segment table of the simulation, e.g. shared by the time
+                                          windows of one simulation (default: built from the simulation data).
+            node_areas (np.ndarray): Optional segment areas by node id (default: `segment_table.node_areas`).
 
-        df_im_combined = df_im_combined.fillna(0)
-        df_im_combined.columns = df_im_combined.columns.astype(int)
-        self.membrane_currents_combined = df_im_combined
+        Returns:
+            np.ndarray: The membrane current tensor (also stored in 'membrane_currents_tensor').
+        """
+        isegments, ivalues = simulation_data['intrinsic_data']
+        ssegments, svalues = simulation_data['synaptic_data']
+        if segment_table is None:
+            segment_table = SegmentTable.from_simulation_data(simulation_data)
+        if node_areas is None:
+            node_areas = segment_table.node_areas(simulation_data['areas'])
+
+        # (itype, node ids, values, synaptic) for every non-empty current type
+        blocks = [(curr, np.atleast_1d(isegments[curr]), ivalues[curr], False) for curr in isegments]
+        blocks += [(curr, np.asarray(ssegments[curr]), svalues[curr], True) for curr in ssegments]
+        blocks = [(curr, segment_table.to_ids(segments), values, synaptic)
+                  for curr, segments, values, synaptic in blocks if len(segments)]
+        for curr, ids, _, _ in blocks:
+            if (ids < 0).any():
+                raise KeyError(f"Unknown segments in {curr} currents")
+
+        # Fixed axes
+        if blocks:
+            segment_ids = pd.unique(np.concatenate(
+                [np.unique(ids) if synaptic else ids for _, ids, _, synaptic in blocks]))
+        else:
+            segment_ids = np.array([], dtype=np.int64)
+        itypes = list(dict.fromkeys(curr for curr, _, _, _ in blocks))
+        n_samples = max((np.shape(values)[-1] for _, _, values, _ in blocks), default=0)
+
+        positions = np.full(len(segment_table), -1)
+        positions[segment_ids] = np.arange(len(segment_ids))
+        itype_index = {curr: k for k, curr in enumerate(itypes)}
+
+        tensor = np.zeros((len(segment_ids), len(itypes), n_samples), dtype=dtype)
+        for curr, ids, values, synaptic in blocks:
+            values = np.asarray(values).reshape(len(ids), -1)
+            rows = positions[ids]
+            k = itype_index[curr]
+            n = values.shape[1]
+            if synaptic:
+                np.add.at(tensor[:, k, :n], rows, values)
+            elif curr == 'injected_current':
+                tensor[rows, k, :n] = -1 * values  # *-1 to follow convention
+            else:
+                # Convert to nA from mA/cm2
+                areas = node_areas[ids]
+                if np.isnan(areas).any():
+                    raise KeyError(f"No area found for segments: {list(segment_table.names(ids[np.isnan(areas)]))}")
+                tensor[rows, k, :n] = values * areas.astype(dtype)[:, None] * 0.01
+
+        self.membrane_currents_tensor = tensor
+        self.segment_ids = np.asarray(segment_ids, dtype=np.int64)
+        self.segment_table = segment_table
+        self.itypes = np.array(itypes, dtype=str)
+        return tensor
+
+    def tensor_frame(self) -> pd.DataFrame:
+        """
+        Returns a DataFrame view of the membrane current tensor (no copy of the values).
 
+        Returns:
+            pd.DataFrame: Rows are indexed by ('segment', 'itype'), columns are time points.
+        """
+        return tensor_to_frame(self.membrane_currents_tensor, self.segments, self.itypes)
 
     def merge_section_im(self, target: str) -> pd.DataFrame:
         """
         Merges membrane currents of the target section.
 
-        This method filters membrane currents that belong to the specified target,
-        aggregates them by current type, and returns a merged DataFrame.
+        The currents of all segments of the target are summed by current type into a node named after the target,
+        which is placed after the remaining segments.
 
         Args:
             target (str): The target section for merging currents.
@@ -85,14 +154,35 @@ class MembraneCurrentPreprocessor:
         Returns:
             pd.DataFrame: A DataFrame with merged membrane currents for the target section.
         """
-        df_section = self.membrane_currents_combined[self.membrane_currents_combined.index.get_level_values(0).str.startswith(
-            f'{target}(')]  # select all rows belonging to the given segment
-        df_summed_by_itype = df_section.groupby(level='itype', observed=False).sum()  # sum dataframe by current type for each time point
-        df_summed_by_itype = df_summed_by_itype.reset_index()
-        df_summed_by_itype['segment'] = target
-        df_summed_by_itype = df_summed_by_itype.set_index(['segment', 'itype'])
+        return self.merge_groups(SegmentAggregator.from_sections([target]))
 
-        # Update original dataframe with the merged dendritic segment
-        df_merged= pd.concat([self.membrane_currents_combined.drop(df_section.index), df_summed_by_itype], axis=0)
-        return df_merged
+    def merge_groups(self, aggregator: SegmentAggregator) -> pd.DataFrame:
+        """
+        Merges membrane currents of arbitrary segment groups with one sparse matrix product.
+
+        Args:
+            aggregator (SegmentAggregator): The segment grouping (can be reused across simulations).
+
+        Returns:
+            pd.DataFrame: A DataFrame with the merged membrane currents, indexed by ('segment', 'itype').
+        """
+        labels, merged = aggregator.merge_tensor(self.membrane_currents_tensor, self.segment_ids, self.segment_table)
+        return tensor_to_frame(merged, labels, self.itypes)
 
+
+def tensor_to_frame(tensor: np.ndarray, segments, itypes) -> pd.DataFrame:
+    """
+    Wraps a (segment x itype x time) tensor into a DataFrame without copying the values.
+
+    Parameters:
+        tensor (np.ndarray): The membrane current tensor.
+        segments (array-like): Segment names along the first axis.
+        itypes (array-like): Current types along the second axis.
+
+    Returns:
+        pd.DataFrame: Rows are indexed by ('segment', 'itype'), columns are time points.
+    """
+    n_segments, n_itypes, n_samples = tensor.shape
+    multi_index = pd.MultiIndex.from_product([segments, itypes], names=['segment', 'itype'])
+    values = tensor.reshape(n_segments * n_itypes, n_samples)
+    return pd.DataFrame(data=values, index=multi_index, copy=False)
@@ -1,55 +1,215 @@
+import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
+from datasaver.SimulationStore import SimulationStore
 from preprocessor.MembraneCurrentPreprocessor import MembraneCurrentPreprocessor
 from preprocessor.AxialCurrentPreprocessor import AxialCurrentPreprocessor
+from preprocessor.SegmentAggregator import SegmentAggregator
+from preprocessor.SegmentTable import SegmentTable
+from preprocessor.SegmentTree import SegmentTree
+from preprocessor.utils.preprocess_axial import update_root_node
+from preprocessor.utils.preprocess_window import slice_time_window
 
 class Preprocessor:
     """
     Controls preprocessing methods for axial, intrinsic, and synaptic currents.
 
     Args:
-        simulation_data (dict): The simulation data used for preprocessing.
+        simulation_data (dict): The simulation data used for preprocessing, a `SimulationStore`, or the directory of
+                                a simulation store (whose arrays are then memory-mapped).
         target (str): The target section for current preprocessing.
+        dtype (np.dtype): The dtype of all preprocessed currents (membrane potentials are not converted).
     """
-    def __init__(self, simulation_data: dict) -> None:
+    def __init__(self, simulation_data: dict, target: str = 'soma', dtype=None) -> None:
         """
         Initializes the Preprocessor with simulation data, target, partitioning strategy,
         membrane current preprocessor and axial current preprocessor.
 
         Args:
-            simulation_data (dict): The simulation data used for preprocessing.
-            target (str): The target section for current preprocessing.
+            simulation_data (dict): The simulation data used for preprocessing, a `SimulationStore`, or the
+                                    directory of a simulation store.
+            target (str): The target section for current preprocessing (default: 'soma').
+            dtype (np.dtype): The dtype of all preprocessed currents (default: the dtype of the recorded currents,
+                              e.g. float32 for a simulation run with `dtype=np.float32`). Axial currents are
+                              calculated from the float64 membrane potentials and only then cast to this dtype.
             partitioning_strategy (str): Strategy for membrane current preprocessing.
             membrane_current_preprocessor (MembraneCurrentPreprocessor): An instance for processing membrane currents.
             axial_current_preprocessor (AxialCurrentPreprocessor): An instance for processing axial currents.
         """
+        if isinstance(simulation_data, (str, os.PathLike)):
+            simulation_data = SimulationStore(simulation_data)
         self.simulation_data = simulation_data
-        self.target = 'soma'  # soma is always the target compartment for the preprocessing steps
+        self.target = target
+        if dtype is None:
+            # membrane potentials are always float64, so the recorded currents give the dtype of the simulation
+            currents = simulation_data['intrinsic_data'][1]
+            dtypes = [np.asarray(values).dtype for values in currents.values()]
+            dtype = np.result_type(*dtypes) if dtypes else np.float64
+        self.dtype = np.dtype(dtype)
         self.membrane_current_preprocessor = MembraneCurrentPreprocessor()
         self.axial_current_preprocessor = AxialCurrentPreprocessor()
+        self._membrane_currents_combined = False
+        self._axial_currents_calculated = False
+
+    def combine_membrane_currents(self) -> None:
+        """
+        Combines the membrane currents of all segments (only once; shared by all targets).
+        """
+        if not self._membrane_currents_combined:
+            self.membrane_current_preprocessor.combine_membrane_currents(self.simulation_data, self.dtype)
+            self._membrane_currents_combined = True
+
+    def calculate_axial_currents(self) -> None:
+        """
+        Calculates the axial currents between all segments (only once; shared by all targets).
+        """
+        if not self._axial_currents_calculated:
+            self.axial_current_preprocessor.calculate_axial_currents(self.simulation_data, self.dtype)
+            self._axial_currents_calculated = True
 
     def preprocess_membrane_currents(self) -> pd.DataFrame:
         """
         Preprocesses membrane currents using the MembraneCurrentPreprocessor.
-        Combines and merges membrane currents based on the target section.
+        Combines membrane currents and merges the soma and the target section (see `target_aggregator`).
 
         Returns:
             pd.DataFrame: A DataFrame containing processed membrane current data.
         """
         print("Preprocessing membrane currents...")
-        self.membrane_current_preprocessor.combine_membrane_currents(self.simulation_data)
-        im = self.membrane_current_preprocessor.merge_section_im(self.target)
+        self.combine_membrane_currents()
+        im = self.membrane_current_preprocessor.merge_groups(self.target_aggregator(self.target))
         return im
 
     def preprocess_axial_currents(self) -> pd.DataFrame:
         """
         Preprocesses axial currents using the AxialCurrentPreprocessor.
-        Calculates and merges axial currents based on the target section.
+        Calculates axial currents, merges the soma and the target section (see `target_aggregator`) and re-roots the
+        tree at the target.
 
         Returns:
             pd.DataFrame: A DataFrame containing processed axial current data.
         """
         print('Preprocessing axial currents...')
-        self.axial_current_preprocessor.calculate_axial_currents(self.simulation_data)
-        iax = self.axial_current_preprocessor.merge_section_iax(self.target)
+        self.calculate_axial_currents()
+        iax = self.axial_current_preprocessor.merge_groups(self.target_aggregator(self.target))
+        if self.target != 'soma':
+            iax = update_root_node(iax, self.target)
         return iax
+
+    @staticmethod
+    def target_aggregator(target: str) -> SegmentAggregator:
+        """
+        Returns the segment grouping of a target: the soma and the target section are each merged into one node.
+
+        The same grouping is applied to the membrane and the axial currents, so that both have the same nodes.
+
+        Args:
+            target (str): The target section (e.g. 'soma' or 'dend2').
+
+        Returns:
+            SegmentAggregator: The aggregator merging the soma and the target.
+        """
+        return SegmentAggregator.from_sections(['soma'] if target == 'soma' else ['soma', target])
+
+    def preprocess_target(self, target: str) -> tuple:
+        """
+        Derives the merged membrane currents and the merged, re-rooted axial currents for one target.
+
+        The combined membrane currents and axial currents are computed once and only read here, so this method can
+        be called concurrently for different targets.
+
+        Args:
+            target (str): The target section (e.g. 'soma' or 'dend2').
+
+        Returns:
+            tuple:
+                - im (pd.DataFrame): The membrane currents with the soma and the target merged.
+                - iax (pd.DataFrame): The axial currents with the soma and the target merged, rooted at the target.
+        """
+        self.combine_membrane_currents()
+        self.calculate_axial_currents()
+        aggregator = self.target_aggregator(target)
+        im = self.membrane_current_preprocessor.merge_groups(aggregator)
+        iax = self.axial_current_preprocessor.merge_groups(aggregator)
+        if target != 'soma':
+            iax = update_root_node(iax, target)
+        return im, iax
+
+    def preprocess_targets(self, targets: list, max_workers: int = None) -> dict:
+        """
+        Preprocesses membrane and axial currents for several targets, sharing one base computation.
+
+        The combined membrane currents and axial currents are computed once; the per-target merging and re-rooting
+        runs on a thread pool.
+
+        Args:
+            targets (list): The target sections.
+            max_workers (int): Maximum number of threads (default: the ThreadPoolExecutor default). Use 1 to
+                               process the targets sequentially.
+
+        Returns:
+            dict: Maps each target to its (im, iax) tuple (see `preprocess_target`), in the order of `targets`.
+        """
+        print('Preprocessing membrane and axial currents...')
+        self.combine_membrane_currents()
+        self.calculate_axial_currents()
+        targets = list(dict.fromkeys(targets))
+        if max_workers == 1 or len(targets) <= 1:
+            return {target: self.preprocess_target(target) for target in targets}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self.preprocess_target, targets)
+            return dict(zip(targets, results))
+
+    def iter_time_windows(self, window_size: int, target: str = None):
+        """
+        Preprocesses membrane and axial currents in windows of time points and yields the merged chunks.
+
+        Only one window of the simulation data is processed (and, for memory-mapped recordings, read) at a time, so
+        each chunk can be saved or partitioned before the next one is computed. The segment table, the segment
+        areas, the segment aggregation matrices and the tree index for re-rooting are built once and reused for all
+        windows. Columns of the chunks are the
+        indices of their time points in the whole simulation. As for the whole simulation, the axial currents of a
+        window are calculated from the float64 membrane potentials and cast to the dtype of the preprocessor.
+
+        Args:
+            window_size (int): Number of time points per window.
+            target (str): The target section (default: the target of the preprocessor).
+
+        Yields:
+            tuple:
+                - start (int): Index of the first time point of the window.
+                - stop (int): Index after the last time point of the window.
+                - im (pd.DataFrame): The merged membrane currents of the window (soma and target merged, as for
+                                     `preprocess_target`).
+                - iax (pd.DataFrame): The merged (and re-rooted) axial currents of the window.
+        """
+        if window_size <= 0:
+            raise ValueError(f"Invalid window size: {window_size}")
+        target = self.target if target is None else target
+        aggregator = self.target_aggregator(target)
+        segment_table = SegmentTable.from_simulation_data(self.simulation_data)
+        node_areas = segment_table.node_areas(self.simulation_data['areas'])
+        tree = None
+
+        n_samples = len(self.simulation_data['taxis'])
+        for start in range(0, n_samples, window_size):
+            stop = min(start + window_size, n_samples)
+            window_data = slice_time_window(self.simulation_data, start, stop)
+
+            membrane_current_preprocessor = MembraneCurrentPreprocessor()
+            membrane_current_preprocessor.combine_membrane_currents(window_data, self.dtype, segment_table, node_areas)
+            im = membrane_current_preprocessor.merge_groups(aggregator)
+
+            axial_current_preprocessor = AxialCurrentPreprocessor()
+            axial_current_preprocessor.calculate_axial_currents(window_data, self.dtype, segment_table)
+            iax = axial_current_preprocessor.merge_groups(aggregator)
+            if target != 'soma':
+                if tree is None:
+                    tree = SegmentTree(iax.index)
+                iax = update_root_node(iax, target, tree)
+
+            im.columns = pd.RangeIndex(start, stop)
+            iax.columns = pd.RangeIndex(start, stop)
+            yield start, stop, im, iax
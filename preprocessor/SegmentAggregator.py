@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from preprocessor.SegmentTable import SegmentTable
+
+
+class SegmentAggregator:
+    """
+    Merges the membrane and axial currents of groups of segments (sections, regions or user-defined compartments).
+
+    Every group is a list of section names (e.g. 'dend1', standing for all segments of the section) and/or segment
+    names (e.g. 'dend2(0.5)'). Segments outside all groups are kept as they are. Merging is a single product of a
+    sparse aggregation matrix with the currents of all time points. Groups are resolved to integer node ids with a
+    `SegmentTable`, and the matrices only depend on the node ids, so they are built once and cached: one aggregator
+    can be applied to the results of any number of simulations of the same model.
+
+    Args:
+        groups (dict): Maps group names to lists of section and segment names.
+    """
+    def __init__(self, groups: dict) -> None:
+        self.groups = {group: list(members) for group, members in groups.items()}
+        owners = {}
+        for group, members in self.groups.items():
+            for member in members:
+                if owners.setdefault(member, group) != group:
+                    raise ValueError(f"{member} is assigned to more than one group")
+        self._group_names = np.array(list(self.groups), dtype=object)
+        self._codes = {}
+        self._matrices = {}
+
+    @classmethod
+    def from_sections(cls, sections) -> 'SegmentAggregator':
+        """
+        Creates an aggregator merging each of the given sections into one node named after the section.
+        """
+        return cls({section: [section] for section in sections})
+
+    def group_codes(self, segment_table: SegmentTable) -> np.ndarray:
+        """
+        Returns the group code of every node id of the table (-1 for nodes outside all groups).
+        """
+        if segment_table.key not in self._codes:
+            self._codes[segment_table.key] = segment_table.group_codes(self.groups)
+        return self._codes[segment_table.key]
+
+    def _nodes(self, ids: np.ndarray, segment_table: SegmentTable) -> np.ndarray:
+        # merged node of every id: the id itself outside all groups, len(table) + group code otherwise
+        codes = self.group_codes(segment_table)[ids]
+        return np.where(codes < 0, ids, len(segment_table) + codes)
+
+    def _labels(self, nodes: np.ndarray, segment_table: SegmentTable) -> np.ndarray:
+        # names of merged nodes (only produced for the output)
+        grouped = nodes >= len(segment_table)
+        labels = segment_table.names(np.where(grouped, 0, nodes))
+        labels[grouped] = self._group_names[nodes[grouped] - len(segment_table)]
+        return labels
+
+    def segment_matrix(self, segment_ids, segment_table: SegmentTable) -> tuple:
+        """
+        Returns the sparse segment-to-group matrix for a list of (unique) node ids.
+
+        Parameters:
+            segment_ids (array-like): The node ids.
+            segment_table (SegmentTable): The segment table the ids refer to.
+
+        Returns:
+            tuple:
+                - labels (np.ndarray): Names of the merged nodes: the segments outside all groups (in the given
+                                       order), followed by the groups (in the order of `groups`).
+                - matrix (sparse.csr_matrix): A (labels x segments) matrix of ones.
+        """
+        segment_ids = np.asarray(segment_ids, dtype=np.int64)
+        key = ('segments', segment_table.key, segment_ids.tobytes())
+        if key not in self._matrices:
+            nodes = self._nodes(segment_ids, segment_table)
+            # segments outside all groups keep their order (and precede the groups, which are ordered by code)
+            unique_nodes, first, rows = np.unique(nodes, return_index=True, return_inverse=True)
+            grouped = unique_nodes >= len(segment_table)
+            order = np.lexsort((np.where(grouped, unique_nodes, first), grouped))
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            matrix = sparse.csr_matrix((np.ones(len(nodes)), (rank[rows.ravel()], np.arange(len(nodes)))),
+                                       shape=(len(order), len(nodes)))
+            self._matrices[key] = (self._labels(unique_nodes[order], segment_table), matrix)
+        return self._matrices[key]
+
+    def merge_tensor(self, tensor: np.ndarray, segment_ids, segment_table: SegmentTable) -> tuple:
+        """
+        Merges a (segment x itype x time) membrane current tensor.
+
+        Parameters:
+            tensor (np.ndarray): The membrane currents (see `MembraneCurrentPreprocessor`).
+            segment_ids (array-like): Node ids along the first axis of the tensor.
+            segment_table (SegmentTable): The segment table the ids refer to.
+
+        Returns:
+            tuple:
+                - labels (np.ndarray): Names of the merged nodes (see `segment_matrix`).
+                - merged (np.ndarray): The (labels x itype x time) merged membrane currents.
+        """
+        labels, matrix = self.segment_matrix(segment_ids, segment_table)
+        n_segments, n_itypes, n_samples = tensor.shape
+        merged = matrix.astype(tensor.dtype) @ tensor.reshape(n_segments, n_itypes * n_samples)
+        return labels, np.asarray(merged).reshape(len(labels), n_itypes, n_samples)
+
+    def merge_im(self, df: pd.DataFrame, segment_table: SegmentTable = None) -> pd.DataFrame:
+        """
+        Merges membrane currents given as a DataFrame indexed by (segment, itype).
+
+        Parameters:
+            df (pd.DataFrame): Membrane currents with a ('segment', 'itype') MultiIndex and time points as columns.
+            segment_table (SegmentTable): The segment table of the model (default: built from the segment names).
+
+        Returns:
+            pd.DataFrame: The merged membrane currents. Rows of segments outside all groups come first (in their
+                          original order), followed by the rows of the groups.
+        """
+        segments = df.index.get_level_values(0)
+        if segment_table is None:
+            segment_table = SegmentTable.from_names(segments)
+        key = ('im', segment_table.key, tuple(df.index))
+        if key not in self._matrices:
+            ids = segment_table.ids(segments)
+            if (ids < 0).any():
+                raise ValueError(f"Unknown segments: {sorted(set(segments[ids < 0]))}")
+            nodes = self._nodes(ids, segment_table)
+            itype_codes, itypes = pd.factorize(df.index.get_level_values(1))
+
+            # one output row per (merged node, itype); nodes ordered as in `segment_matrix`, itypes by appearance
+            _, node_first = np.unique(nodes, return_index=True)
+            node_rank = np.zeros(nodes.max() + 1 if len(nodes) else 0, dtype=np.int64)
+            node_rank[nodes[node_first]] = np.where(nodes[node_first] >= len(segment_table),
+                                                    len(nodes) + nodes[node_first], node_first)
+            pairs, first, rows = np.unique(nodes * max(len(itypes), 1) + itype_codes,
+                                           return_index=True, return_inverse=True)
+            order = np.lexsort((first, node_rank[nodes[first]]))
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            matrix = sparse.csr_matrix((np.ones(len(nodes)), (rank[rows.ravel()], np.arange(len(nodes)))),
+                                       shape=(len(order), len(nodes)))
+            labels = self._labels(nodes[first[order]], segment_table)
+            index = pd.MultiIndex.from_arrays([labels, np.asarray(itypes)[itype_codes[first[order]]]],
+                                              names=df.index.names)
+            self._matrices[key] = (index, matrix)
+
+        index, matrix = self._matrices[key]
+        values = df.to_numpy()
+        merged = np.asarray(matrix.astype(values.dtype) @ values)
+        return pd.DataFrame(data=merged, index=index, columns=df.columns)
+
+    def merge_iax(self, df: pd.DataFrame, segment_table: SegmentTable = None) -> pd.DataFrame:
+        """
+        Merges axial currents given as a DataFrame indexed by (ref, par) segment names.
+
+        Parameters:
+            df (pd.DataFrame): Axial currents with a ('ref', 'par') MultiIndex and time points as columns.
+            segment_table (SegmentTable): The segment table of the model (default: built from the segment names).
+
+        Returns:
+            pd.DataFrame: The merged axial currents (see `merge_iax_ids`).
+        """
+        refs = df.index.get_level_values(0)
+        pars = df.index.get_level_values(1)
+        if segment_table is None:
+            segment_table = SegmentTable.from_names(np.concatenate([refs, pars[pars != 'None']]))
+        ref_ids, par_ids = segment_table.ids(refs), segment_table.ids(pars)
+        unknown = (ref_ids < 0) | ((par_ids < 0) & (pars != 'None'))
+        if unknown.any():
+            raise ValueError(f"Unknown segments in {list(df.index[unknown])}")
+        return self.merge_iax_ids(ref_ids, par_ids, df.to_numpy(), segment_table, columns=df.columns)
+
+    def merge_iax_ids(self, ref_ids, par_ids, values: np.ndarray, segment_table: SegmentTable,
+                      columns=None) -> pd.DataFrame:
+        """
+        Merges axial currents of connections given by integer node ids.
+
+        Connections within a group and connections to a missing parent (id -1) are dropped. The remaining
+        connections get the groups as reference and parent; parallel connections between the same two nodes are
+        summed (connections in the opposite direction are negated first).
+
+        Parameters:
+            ref_ids (array-like): Node id of the reference segment of every connection.
+            par_ids (array-like): Node id of the parent segment of every connection (-1 if there is none).
+            values (np.ndarray): The (connection x time) axial currents.
+            segment_table (SegmentTable): The segment table the ids refer to.
+            columns (array-like): Optional column labels of the result.
+
+        Returns:
+            pd.DataFrame: The merged axial currents, indexed by ('ref', 'par'). Connections between segments
+                          outside all groups come first (in their original order), followed by the connections of
+                          the groups.
+        """
+        ref_ids = np.asarray(ref_ids, dtype=np.int64)
+        par_ids = np.asarray(par_ids, dtype=np.int64)
+        key = ('iax', segment_table.key, ref_ids.tobytes(), par_ids.tobytes())
+        if key not in self._matrices:
+            has_parent = par_ids >= 0
+            ref_nodes = self._nodes(ref_ids, segment_table)
+            par_nodes = np.where(has_parent, self._nodes(np.where(has_parent, par_ids, 0), segment_table), -1)
+            kept = has_parent & (ref_nodes != par_nodes)
+            touched = (ref_nodes != ref_ids) | (par_nodes != par_ids)
+            edges = np.concatenate([np.flatnonzero(kept & ~touched), np.flatnonzero(kept & touched)])
+
+            # identify connections by their (unordered) pair of nodes; the first occurrence sets the direction
+            low = np.minimum(ref_nodes[edges], par_nodes[edges])
+            high = np.maximum(ref_nodes[edges], par_nodes[edges])
+            n_nodes = len(segment_table) + len(self.groups)
+            _, first, rows = np.unique(low * n_nodes + high, return_index=True, return_inverse=True)
+            rows = rows.ravel()
+            order = np.argsort(first)
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            forward = ref_nodes[edges] < par_nodes[edges]
+            signs = np.where(forward == forward[first][rows], 1.0, -1.0)
+            matrix = sparse.csr_matrix((signs, (rank[rows], edges)), shape=(len(order), len(ref_ids)))
+
+            first_edges = edges[first[order]]
+            index = pd.MultiIndex.from_arrays([self._labels(ref_nodes[first_edges], segment_table),
+                                               self._labels(par_nodes[first_edges], segment_table)],
+                                              names=['ref', 'par'])
+            self._matrices[key] = (index, matrix)
+
+        index, matrix = self._matrices[key]
+        merged = np.asarray(matrix.astype(values.dtype) @ values)
+        return pd.DataFrame(data=merged, index=index, columns=columns)
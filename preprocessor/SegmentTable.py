@@ -0,0 +1,121 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+class SegmentTable:
+    """
+    Integer coding of the segments (nodes) of a model.
+
+    Every node has an integer id (its position in the table), a section id and its position x along the section.
+    The recordings and the preprocessors work on these ids, and names are only produced for the output (recordings
+    saved with segment names are looked up once when they are read). Id -1 stands for a missing node (the parent of
+    the root, 'None').
+
+    Args:
+        segments (array-like): Node names (e.g. 'dend1(0.5)') in id order.
+        sections (array-like): Section name of every node.
+        x (array-like): Position of every node along its section.
+    """
+    def __init__(self, segments, sections, x) -> None:
+        self.segments = np.asarray(segments, dtype=object)
+        section_ids, section_names = pd.factorize(np.asarray(sections, dtype=object))
+        self.section_ids = section_ids.astype(np.int32)
+        self.section_names = np.asarray(section_names, dtype=object)
+        self.x = np.asarray(x, dtype=float)
+        self.key = hashlib.sha1('\n'.join(self.segments).encode()).hexdigest()
+        self._segment_index = pd.Index(self.segments)
+        self._section_index = pd.Index(self.section_names)
+        self._names = np.append(self.segments, 'None')  # id -1 selects 'None'
+
+    @classmethod
+    def from_frame(cls, segment_table: pd.DataFrame) -> 'SegmentTable':
+        """
+        Creates the table from the segment table of a simulation (see `build_segment_table`).
+        """
+        return cls(segment_table['segment'], segment_table['section'], segment_table['x'])
+
+    @classmethod
+    def from_names(cls, segments) -> 'SegmentTable':
+        """
+        Creates the table from node names of the form 'section(x)', e.g. for data saved without a segment table.
+        """
+        segments = pd.unique(np.asarray(segments, dtype=object))
+        parts = [segment.rsplit('(', 1) for segment in segments]
+        return cls(segments, [section for section, _ in parts], [float(x.rstrip(')')) for _, x in parts])
+
+    @classmethod
+    def from_simulation_data(cls, simulation_data) -> 'SegmentTable':
+        """
+        Returns the segment table of the simulation data, falling back to the names of the segment areas.
+        """
+        segment_table = simulation_data['segment_table'] if 'segment_table' in simulation_data else None
+        if segment_table is not None:
+            return cls.from_frame(segment_table)
+        return cls.from_names(simulation_data['areas'].index)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def ids(self, segments) -> np.ndarray:
+        """
+        Returns the ids of the given node names (-1 for names that are not in the table, e.g. 'None').
+        """
+        return self._segment_index.get_indexer(np.asarray(segments, dtype=object))
+
+    def to_ids(self, segments) -> np.ndarray:
+        """
+        Returns the ids of recorded segments, given as node ids (as recorded by `run_simulation`) or as names (as in
+        data saved by earlier versions).
+        """
+        segments = np.asarray(segments)
+        if segments.dtype.kind in 'iu':
+            return segments.astype(np.int64, copy=False)
+        return self.ids(segments)
+
+    def names(self, ids) -> np.ndarray:
+        """
+        Returns the names of the given node ids ('None' for id -1).
+        """
+        return self._names[np.asarray(ids, dtype=np.int64)]
+
+    def node_areas(self, areas: pd.DataFrame) -> np.ndarray:
+        """
+        Aligns the segment areas to the node ids (NaN for nodes without an area).
+        """
+        ids = self.ids(areas.index)
+        found = ids >= 0
+        node_areas = np.full(len(self), np.nan)
+        node_areas[ids[found]] = areas.iloc[:, 0].to_numpy()[found]
+        return node_areas
+
+    def group_codes(self, groups: dict) -> np.ndarray:
+        """
+        Returns the group of every node: the position of its group in `groups`, or -1 for nodes outside all groups.
+
+        Parameters:
+            groups (dict): Maps group names to lists of section names and/or segment names.
+
+        Returns:
+            np.ndarray: The group code of every node id.
+        """
+        section_codes = np.full(len(self.section_names), -1)
+        segment_members = []
+        for code, members in enumerate(groups.values()):
+            for member in members:
+                if '(' in member:
+                    segment_members.append((member, code))
+                else:
+                    section_id = self._section_index.get_indexer([member])[0]
+                    if section_id < 0:
+                        raise ValueError(f"Unknown section: {member}")
+                    section_codes[section_id] = code
+
+        codes = section_codes[self.section_ids]
+        if segment_members:
+            ids = self.ids([member for member, _ in segment_members])
+            if (ids < 0).any():
+                unknown = [member for (member, _), node in zip(segment_members, ids) if node < 0]
+                raise ValueError(f"Unknown segments: {unknown}")
+            codes[ids] = [code for _, code in segment_members]
+        return codes
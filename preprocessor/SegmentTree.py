@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+class SegmentTree:
+    """
+    Parent-array index of the tree formed by the (ref, par) connections of an axial current table.
+
+    Nodes are numbered in order of appearance. For every node, the index stores its parent node, the row of the
+    connection to its parent and its depth, so paths between nodes are found by walking up the tree (O(depth))
+    instead of searching a graph. The index only depends on the connections, so it can be reused for every
+    simulation of the same (merged) model.
+
+    Args:
+        index (pd.MultiIndex): The (ref, par) pairs. Every node may appear at most once as 'ref'.
+    """
+    def __init__(self, index: pd.MultiIndex) -> None:
+        refs = np.asarray(index.get_level_values(0))
+        pars = np.asarray(index.get_level_values(1))
+        n_edges = len(refs)
+        codes, nodes = pd.factorize(np.concatenate([refs, pars]))
+        ref_ids, par_ids = codes[:n_edges], codes[n_edges:]
+        if len(np.unique(ref_ids)) != n_edges:
+            raise ValueError("Every node must have at most one parent connection")
+
+        self.nodes = pd.Index(nodes)
+        self.parent = np.full(len(nodes), -1)
+        self.parent[ref_ids] = par_ids
+        self.parent_edge = np.full(len(nodes), -1)
+        self.parent_edge[ref_ids] = np.arange(n_edges)
+
+        # Depth of all nodes at once: follow the parent pointers until every node has reached its root
+        self.depth = np.zeros(len(nodes), dtype=int)
+        ancestor = self.parent.copy()
+        while (ancestor >= 0).any():
+            active = ancestor >= 0
+            self.depth[active] += 1
+            if self.depth.max() > len(nodes):
+                raise ValueError("The connections contain a cycle")
+            ancestor[active] = self.parent[ancestor[active]]
+
+    def path_edges(self, source: str, target: str) -> np.ndarray:
+        """
+        Returns the connection rows on the path between two nodes.
+
+        Parameters:
+            source (str): Name of the first node.
+            target (str): Name of the second node.
+
+        Returns:
+            np.ndarray: Row positions (in the connection table) of the connections on the path.
+        """
+        a, b = self.nodes.get_loc(source), self.nodes.get_loc(target)
+        edges = []
+        while a != b:
+            # always move the deeper node up, so both meet at their lowest common ancestor
+            if self.depth[a] >= self.depth[b]:
+                edges.append(self.parent_edge[a])
+                a = self.parent[a]
+            else:
+                edges.append(self.parent_edge[b])
+                b = self.parent[b]
+            if a < 0 or b < 0:
+                raise ValueError(f"No path between {source} and {target}")
+        return np.array(edges, dtype=int)
+
+    def reroot(self, df: pd.DataFrame, new_root: str, original_root: str = 'soma') -> pd.DataFrame:
+        """
+        Switches the reference and parent of the connections between the new and the original root and negates
+        their axial currents.
+
+        Parameters:
+            df (pd.DataFrame): Axial currents whose rows are the connections this tree was built from.
+            new_root (str): The node that becomes the root.
+            original_root (str): The current root node.
+
+        Returns:
+            pd.DataFrame: The re-rooted axial currents: the unchanged connections, followed by the switched ones.
+        """
+        path = np.sort(self.path_edges(new_root, original_root))
+        keep = np.ones(len(df), dtype=bool)
+        keep[path] = False
+
+        refs = np.asarray(df.index.get_level_values(0))
+        pars = np.asarray(df.index.get_level_values(1))
+        values = df.to_numpy()
+        index = pd.MultiIndex.from_arrays([np.concatenate([refs[keep], pars[path]]),
+                                           np.concatenate([pars[keep], refs[path]])], names=['ref', 'par'])
+        return pd.DataFrame(data=np.concatenate([values[keep], -values[path]]), index=index, columns=df.columns)
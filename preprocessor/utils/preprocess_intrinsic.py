@@ -1,48 +0,0 @@
-import numpy as np
-import pandas as pd
-
-
-def change_unit_na(currents: pd.DataFrame, area: pd.DataFrame) -> pd.DataFrame:
-    """
-    Convert membrane currents to nA from mA/cm2.
-
-    Parameters:
-        currents (df): DataFrame containing membrane currents.
-        area (df): DataFrame containing segment areas.
-
-    Returns
-        df_converted (df): DataFrame containing membrane currents in nA.
-    """
-    array_converted = np.zeros_like(currents.values)
-    for i, segment in enumerate(currents.index):
-        segment_area = area.loc[segment].values[0]
-        array_na = currents.loc[segment] * segment_area * 0.01
-        array_converted[i, :] = array_na
-
-    df_converted = pd.DataFrame(data=array_converted, index=list(currents.index), columns=list(currents.columns))
-    df_converted = df_converted.reset_index()
-    return df_converted
-
-
-def preprocess_intrinsic(segments, values, area):
-    currents = list(segments.keys())
-    dfs = []
-    for curr in currents:
-        seg = segments[curr]
-        val = values[curr]
-        # Ensure val and seg have the same length
-        if curr == 'injected_current':
-            # Reshape val into a 2D array with one row
-            val_reshaped = val.reshape(1, -1)
-            df = pd.DataFrame(data=-1*val_reshaped)  # *-1 to follow convention
-            df['index'] = seg
-            df_converted = df
-        else:
-            df = pd.DataFrame(data=val, index=seg)
-            df_converted = change_unit_na(df, area)
-
-
-        df_converted.insert(1, 'itype', curr)
-        df_converted[['index', 'itype']] = df_converted[['index', 'itype']].astype('category')
-        dfs.append(df_converted)
-    return dfs
@@ -0,0 +1,26 @@
+def slice_time_window(simulation_data, start: int, stop: int) -> dict:
+    """
+    Returns the simulation data restricted to a window of time points.
+
+    Arrays are sliced, not copied, so memory-mapped recordings are only read when the window is processed.
+
+    Parameters:
+        simulation_data (dict): The simulation data (e.g. a SimulationResult).
+        start (int): Index of the first time point of the window.
+        stop (int): Index after the last time point of the window.
+
+    Returns:
+        dict: Simulation data with the same keys, covering time points [start, stop).
+    """
+    segments, membrane_potential = simulation_data['membrane_potential_data']
+    isegments, ivalues = simulation_data['intrinsic_data']
+    ssegments, svalues = simulation_data['synaptic_data']
+    return {
+        'taxis': simulation_data['taxis'][start:stop],
+        'membrane_potential_data': [segments, membrane_potential[..., start:stop]],
+        'intrinsic_data': [isegments, {curr: values[..., start:stop] for curr, values in ivalues.items()}],
+        'synaptic_data': [ssegments, {curr: values[..., start:stop] for curr, values in svalues.items()}],
+        'connections': simulation_data['connections'],
+        'areas': simulation_data['areas'],
+        'segment_table': simulation_data['segment_table'] if 'segment_table' in simulation_data else None,
+    }